@@ -96,8 +96,38 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Gallery previews, generated in the background and served with a long max-age
+THUMBNAIL_CACHE_DIR = os.getenv('THUMBNAIL_CACHE_DIR', os.path.join(MEDIA_ROOT, 'thumbs'))
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv('THUMBNAIL_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+THUMBNAIL_SIZE = int(os.getenv('THUMBNAIL_SIZE', '400'))
+THUMBNAIL_FORMAT = os.getenv('THUMBNAIL_FORMAT', 'WEBP').upper()
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', '75'))
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', '2'))
+
+# Seconds a worker process keeps the FileType price table between reloads
+PRICE_CACHE_TTL = int(os.getenv('PRICE_CACHE_TTL', '60'))
+
+# Bulk upload limits (per request, ZIP members counted individually)
+BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', '1000'))
+BULK_UPLOAD_MAX_BYTES = int(os.getenv('BULK_UPLOAD_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+# Django rejects multipart requests with more files than this (default 100)
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES
+
+# Gallery
+GALLERY_PAGE_SIZE = int(os.getenv('GALLERY_PAGE_SIZE', '12'))
+GALLERY_COUNT_CACHE_TTL = int(os.getenv('GALLERY_COUNT_CACHE_TTL', '300'))
+
 # FastAPI integration
 FASTAPI_URL = os.getenv('FASTAPI_URL', 'http://fastapi:8000')
+FASTAPI_CONNECT_TIMEOUT = float(os.getenv('FASTAPI_CONNECT_TIMEOUT', '3'))
+FASTAPI_READ_TIMEOUT = float(os.getenv('FASTAPI_READ_TIMEOUT', '30'))
+FASTAPI_RETRIES = int(os.getenv('FASTAPI_RETRIES', '2'))
+FASTAPI_RETRY_BACKOFF = float(os.getenv('FASTAPI_RETRY_BACKOFF', '0.5'))
+FASTAPI_POOL_SIZE = int(os.getenv('FASTAPI_POOL_SIZE', '10'))
+# Address of the backend as seen from the browser (task status event stream)
+FASTAPI_PUBLIC_URL = os.getenv('FASTAPI_PUBLIC_URL', 'http://localhost:8000')
+# MEDIA_ROOT is mounted into the backend as SHARED_MEDIA_ROOT: send storage keys, not file bytes
+BACKEND_SHARED_MEDIA = os.getenv('BACKEND_SHARED_MEDIA', 'false').lower() == 'true'
 
 # Login redirect
 LOGIN_URL = 'login'
@@ -7,4 +7,13 @@ class DocumentsConfig(AppConfig):
     """
     name = 'documents'
 
-    verbose_name = 'Document Management'
\ No newline at end of file
+    verbose_name = 'Document Management'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from . import pricing
+        from .models import FileType
+
+        # Price table edits (e.g. FileTypeAdmin list_editable) drop the cached table
+        post_save.connect(pricing.invalidate, sender=FileType, dispatch_uid='filetype_prices_saved')
+        post_delete.connect(pricing.invalidate, sender=FileType, dispatch_uid='filetype_prices_deleted')
\ No newline at end of file
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class BackendError(Exception):
+    pass
+
+
+# Upload is safe to retry: the backend stores files by content hash
+RETRY_STATUSES = (502, 503, 504)
+RETRY_METHODS = frozenset({'GET', 'POST'})
+CHUNK_SIZE = 1024 * 1024
+
+
+class BackendClient:
+    """Blocking FastAPI client for WSGI views.
+
+    One instance is shared by all threads so keep-alive connections are reused
+    from a bounded pool instead of opening a TCP connection per request.
+    """
+
+    def __init__(self, base_url=None):
+        self.base_url = (base_url or settings.FASTAPI_URL).rstrip('/')
+        self.timeout = (settings.FASTAPI_CONNECT_TIMEOUT, settings.FASTAPI_READ_TIMEOUT)
+
+        retry = Retry(
+            total=settings.FASTAPI_RETRIES,
+            backoff_factor=settings.FASTAPI_RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.FASTAPI_POOL_SIZE,
+            pool_block=True,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _request(self, method, path, **kwargs):
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            raise BackendError(str(e)) from e
+        if response.status_code >= 400:
+            raise BackendError(f"{method} {path} returned {response.status_code}")
+        return response.json()
+
+    def submit_document(self, file_path, doc_date, owner=None):
+        """Upload the file and queue it for OCR in a single request.
+
+        ``owner`` identifies the submitter for the backend's fair scheduling.
+        """
+        # A file object body is streamed from disk and rewound by urllib3 on retry
+        with open(file_path, 'rb') as f:
+            return self._request('POST', '/upload_raw', data=f, params={
+                'filename': os.path.basename(file_path),
+                'doc_date': doc_date.isoformat(),
+                'analyse': 'true',
+                'owner': owner,
+            }, headers={'Content-Type': 'application/octet-stream'})
+
+    def register_document(self, storage_key, doc_date, owner=None):
+        """Queue OCR for a file already on the shared media volume; no bytes are sent."""
+        return self._request('POST', '/register_doc', json={
+            'storage_key': storage_key,
+            'doc_date': doc_date.isoformat(),
+            'analyse': True,
+            'owner': owner,
+        })
+
+    def task_status(self, task_id):
+        return self._request('GET', f"/task_status/{task_id}")
+
+
+class AsyncBackendClient:
+    """Non-blocking FastAPI client for async views.
+
+    httpx connections are bound to the event loop that opened them, so views
+    share one client per loop through ``get_async_backend_client()``.
+    """
+
+    def __init__(self, base_url=None):
+        self.client = httpx.AsyncClient(
+            base_url=(base_url or settings.FASTAPI_URL).rstrip('/'),
+            timeout=httpx.Timeout(settings.FASTAPI_READ_TIMEOUT, connect=settings.FASTAPI_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.FASTAPI_POOL_SIZE,
+                max_keepalive_connections=settings.FASTAPI_POOL_SIZE,
+            ),
+            # Retries connection failures only; a response is never re-sent
+            transport=httpx.AsyncHTTPTransport(retries=settings.FASTAPI_RETRIES),
+        )
+
+    async def _request(self, method, path, **kwargs):
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            raise BackendError(str(e)) from e
+        if response.status_code >= 400:
+            raise BackendError(f"{method} {path} returned {response.status_code}")
+        return response.json()
+
+    @staticmethod
+    async def _read_chunks(file_path):
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def submit_document(self, file_path, doc_date, owner=None):
+        return await self._request('POST', '/upload_raw', content=self._read_chunks(file_path), params={
+            'filename': os.path.basename(file_path),
+            'doc_date': doc_date.isoformat(),
+            'analyse': 'true',
+            'owner': owner,
+        }, headers={'Content-Type': 'application/octet-stream'})
+
+    async def register_document(self, storage_key, doc_date, owner=None):
+        return await self._request('POST', '/register_doc', json={
+            'storage_key': storage_key,
+            'doc_date': doc_date.isoformat(),
+            'analyse': True,
+            'owner': owner,
+        })
+
+    async def task_status(self, task_id):
+        return await self._request('GET', f"/task_status/{task_id}")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_backend_client():
+    global _client
+    if _client is None:
+        _client = BackendClient()
+    return _client
+
+
+async def _close_with_loop(client):
+    # loop.shutdown_asyncgens() finalizes started async generators before the
+    # loop closes; asyncio.run, and with it async_to_sync and ASGI servers, calls it
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def get_async_backend_client():
+    """Client pooled for the running event loop and closed when that loop shuts down.
+
+    Under ASGI the loop lives as long as the worker, so connections are kept
+    alive across requests; under WSGI each async_to_sync call has its own loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncBackendClient()
+        # The loop tracks async generators weakly; the client keeps its closer alive
+        client._closer = _close_with_loop(client)
+        await client._closer.__anext__()
+    return client
\ No newline at end of file
@@ -0,0 +1,82 @@
+import os
+import zipfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import pricing
+from .models import Cart, Doc, FileType, UserToDoc, doc_upload_path
+
+SUPPORTED_EXTENSIONS = {ext for ext, _ in FileType.EXTENSION_CHOICES}
+
+
+class BulkUploadError(ValueError):
+    pass
+
+
+def is_zip(uploaded):
+    return os.path.splitext(uploaded.name)[1].lower() == '.zip'
+
+
+def iter_archive(uploaded):
+    """Yield (name, size, stream) for supported members without extracting to memory."""
+    try:
+        archive = zipfile.ZipFile(uploaded)
+    except zipfile.BadZipFile:
+        raise BulkUploadError(f"{uploaded.name} is not a valid ZIP archive")
+
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and os.path.splitext(info.filename)[1].lower() in SUPPORTED_EXTENSIONS
+        ]
+        # Declared sizes are checked up front so an archive cannot expand without bound
+        if sum(info.file_size for info in members) > settings.BULK_UPLOAD_MAX_BYTES:
+            raise BulkUploadError(f"{uploaded.name} expands beyond the upload size limit")
+        for info in members:
+            with archive.open(info) as stream:
+                yield os.path.basename(info.filename), info.file_size, stream
+
+
+def iter_uploads(files):
+    for uploaded in files:
+        if is_zip(uploaded):
+            yield from iter_archive(uploaded)
+        elif os.path.splitext(uploaded.name)[1].lower() in SUPPORTED_EXTENSIONS:
+            yield uploaded.name, uploaded.size, uploaded
+
+
+def ingest(user, files):
+    """Store every supported file and register it with a fixed number of queries.
+
+    Files are written to storage first; rows for all of them are then created
+    with bulk_create in one transaction, and stored files are removed again if
+    it fails.
+    """
+    stored = []
+    try:
+        for name, size, stream in iter_uploads(files):
+            if len(stored) >= settings.BULK_UPLOAD_MAX_FILES:
+                raise BulkUploadError(f"At most {settings.BULK_UPLOAD_MAX_FILES} files per upload")
+            name = default_storage.get_valid_name(name)
+            path = default_storage.save(doc_upload_path(None, name), File(stream, name=name))
+            stored.append((path, size))
+
+        if not stored:
+            raise BulkUploadError("No supported files found")
+
+        with transaction.atomic():
+            docs = Doc.objects.bulk_create([Doc(file_path=path, size=size / 1024) for path, size in stored])
+            UserToDoc.objects.bulk_create([UserToDoc(user=user, doc=doc) for doc in docs])
+            Cart.objects.bulk_create([
+                Cart(user=user, doc=doc, order_price=price)
+                for doc, price in zip(docs, pricing.price_docs(docs))
+            ])
+    except Exception:
+        for path, _ in stored:
+            default_storage.delete(path)
+        raise
+
+    return docs
\ No newline at end of file
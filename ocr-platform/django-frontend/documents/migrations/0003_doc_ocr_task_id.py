@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_gallery_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doc',
+            name='ocr_task_id',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
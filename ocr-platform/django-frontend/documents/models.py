@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 import os
 
+from . import pricing, thumbnails
+
 
 def doc_upload_path(instance, filename):
     return f'docs/{timezone.now().strftime("%Y/%m/%d")}/{filename}'
@@ -11,11 +13,17 @@ def doc_upload_path(instance, filename):
 class Doc(models.Model):
     file_path = models.FileField(upload_to=doc_upload_path)
     size = models.FloatField(help_text="Size in KB")
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Latest backend OCR task; task status is only shown to the document's owners
+    ocr_task_id = models.CharField(max_length=64, blank=True, default='', db_index=True)
 
     def __str__(self):
         return os.path.basename(self.file_path.name)
 
+    @property
+    def thumbnail_url(self):
+        return thumbnails.thumbnail_url(self)
+
     def save(self, *args, **kwargs):
         # Calculate file size in KB
         if not self.pk:  # Only for new files
@@ -30,6 +38,10 @@ class UserToDoc(models.Model):
 
     class Meta:
         unique_together = ('user', 'doc')
+        indexes = [
+            # Serves the gallery keyset scan: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', '-created_at', '-id'], name='usertodoc_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.doc}"
@@ -69,12 +81,5 @@ class Cart(models.Model):
     def save(self, *args, **kwargs):
         # Calculate order price: size * price per KB
         if not self.pk:
-            file_type = FileType.objects.filter(
-                extension=os.path.splitext(self.doc.file_path.name)[1].lower()
-            ).first()
-
-            if file_type:
-                self.order_price = self.doc.size * file_type.price
-            else:
-                self.order_price = 0
+            self.order_price = pricing.price_for(self.doc)
         super().save(*args, **kwargs)
\ No newline at end of file
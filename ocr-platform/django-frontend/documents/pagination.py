@@ -0,0 +1,91 @@
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+class KeysetPage:
+    """One page of a queryset ordered newest first by (created_at, id).
+
+    Pages are addressed by the position of their boundary row instead of an
+    offset, so every page costs one index range scan regardless of depth and
+    no COUNT(*) is needed to render the navigation.
+    """
+
+    def __init__(self, queryset, per_page, after=None, before=None):
+        if before:
+            created_at, pk = decode_cursor(before)
+            # Walk backwards from the cursor and flip the rows into display order
+            rows = list(
+                queryset.filter(created_at__gte=created_at)
+                .exclude(created_at=created_at, id__lte=pk)
+                .order_by('created_at', 'id')[:per_page + 1]
+            )
+            self.has_previous = len(rows) > per_page
+            self.object_list = rows[:per_page][::-1]
+            self.has_next = True
+        else:
+            if after:
+                created_at, pk = decode_cursor(after)
+                queryset = queryset.filter(created_at__lte=created_at).exclude(created_at=created_at, id__gte=pk)
+            rows = list(queryset.order_by('-created_at', '-id')[:per_page + 1])
+            self.has_next = len(rows) > per_page
+            self.object_list = rows[:per_page]
+            self.has_previous = bool(after)
+
+        # A stale "newer" link can land on an empty page: show the newest one instead
+        if before and not self.object_list:
+            self.__init__(queryset, per_page)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        last = self.object_list[-1]
+        return encode_cursor(last.created_at, last.pk)
+
+    @property
+    def previous_cursor(self):
+        first = self.object_list[0]
+        return encode_cursor(first.created_at, first.pk)
+
+
+def gallery_count_key(user_id):
+    return f"gallery_count:{user_id}"
+
+
+def cached_count(user_id, queryset):
+    """Total for the page header, refreshed at most every GALLERY_COUNT_CACHE_TTL seconds."""
+    key = gallery_count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.GALLERY_COUNT_CACHE_TTL)
+    return count
+
+
+def invalidate_count(user_id):
+    cache.delete(gallery_count_key(user_id))
\ No newline at end of file
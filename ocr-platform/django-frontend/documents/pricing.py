@@ -0,0 +1,49 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+
+_prices = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def price_table():
+    """Extension -> price per KB, loaded once per process.
+
+    FileType signals drop the table in the process that saved the change; other
+    worker processes pick it up after PRICE_CACHE_TTL seconds.
+    """
+    global _prices, _loaded_at
+    prices = _prices
+    if prices is not None and time.monotonic() - _loaded_at < settings.PRICE_CACHE_TTL:
+        return prices
+
+    from .models import FileType
+
+    with _lock:
+        if _prices is None or time.monotonic() - _loaded_at >= settings.PRICE_CACHE_TTL:
+            _prices = dict(FileType.objects.values_list('extension', 'price'))
+            _loaded_at = time.monotonic()
+        return _prices
+
+
+def invalidate(**kwargs):
+    global _prices
+    _prices = None
+
+
+def extension(doc):
+    return os.path.splitext(doc.file_path.name)[1].lower()
+
+
+def price_for(doc, prices=None):
+    # Size * price per KB; unknown extensions are free
+    prices = price_table() if prices is None else prices
+    return doc.size * prices.get(extension(doc), 0)
+
+
+def price_docs(docs):
+    prices = price_table()
+    return [price_for(doc, prices) for doc in docs]
\ No newline at end of file
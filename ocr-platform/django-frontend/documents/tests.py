@@ -0,0 +1,314 @@
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from . import pricing, thumbnails
+from .backend_client import get_async_backend_client
+from .bulk import BulkUploadError, ingest
+from .models import Cart, Doc, FileType, UserToDoc
+from .pagination import InvalidCursor, KeysetPage, decode_cursor, encode_cursor
+
+
+class CursorTests(TestCase):
+    def test_round_trip(self):
+        created_at = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+        self.assertEqual(decode_cursor(encode_cursor(created_at, 42)), (created_at, 42))
+
+    def test_cursor_is_url_safe_without_padding(self):
+        cursor = encode_cursor(datetime(2024, 5, 1, tzinfo=timezone.utc), 7)
+        self.assertNotIn('=', cursor)
+        self.assertRegex(cursor, r'^[A-Za-z0-9_-]+$')
+
+    def test_garbage_is_rejected(self):
+        for cursor in ('', 'not-a-cursor', encode_cursor(datetime(2024, 1, 1), 1)[:-3], '////'):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+
+class KeysetPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        docs = Doc.objects.bulk_create([Doc(file_path=f'documents/{i}.png', size=1) for i in range(7)])
+        base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        # Pairs of rows share a timestamp so the id tie-breaker is exercised
+        for i, doc in enumerate(docs):
+            Doc.objects.filter(pk=doc.pk).update(created_at=base + timedelta(minutes=i // 2))
+        cls.newest_first = list(Doc.objects.order_by('-created_at', '-id'))
+
+    def ids(self, page):
+        return [doc.pk for doc in page]
+
+    def test_walks_forward_and_back_without_gaps_or_repeats(self):
+        queryset = Doc.objects.all()
+        pages = [KeysetPage(queryset, 3)]
+        while pages[-1].has_next:
+            pages.append(KeysetPage(queryset, 3, after=pages[-1].next_cursor))
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum((self.ids(page) for page in pages), []), [doc.pk for doc in self.newest_first])
+        self.assertFalse(pages[0].has_previous)
+        self.assertTrue(pages[-1].has_previous)
+
+        back = KeysetPage(queryset, 3, before=pages[-1].previous_cursor)
+        self.assertEqual(self.ids(back), self.ids(pages[1]))
+        self.assertTrue(back.has_previous)
+        self.assertTrue(back.has_next)
+
+        first = KeysetPage(queryset, 3, before=back.previous_cursor)
+        self.assertEqual(self.ids(first), self.ids(pages[0]))
+        self.assertFalse(first.has_previous)
+
+    def test_stale_before_cursor_falls_back_to_newest_page(self):
+        newest = self.newest_first[0]
+        page = KeysetPage(Doc.objects.all(), 3, before=encode_cursor(newest.created_at, newest.pk))
+        self.assertEqual(self.ids(page), [doc.pk for doc in self.newest_first[:3]])
+        self.assertFalse(page.has_previous)
+
+
+@override_settings(PRICE_CACHE_TTL=3600)
+class PriceTableTests(TestCase):
+    def setUp(self):
+        pricing.invalidate()
+        self.addCleanup(pricing.invalidate)
+
+    def test_table_is_cached_between_calls(self):
+        FileType.objects.update_or_create(extension='.png', defaults={'price': 1.0})
+        pricing.invalidate()
+        pricing.price_table()
+        with self.assertNumQueries(0):
+            self.assertEqual(pricing.price_table()['.png'], 1.0)
+
+    def test_saving_a_file_type_invalidates_the_table(self):
+        file_type, _ = FileType.objects.update_or_create(extension='.png', defaults={'price': 1.0})
+        self.assertEqual(pricing.price_table()['.png'], 1.0)
+
+        file_type.price = 2.5
+        file_type.save()
+        self.assertEqual(pricing.price_table()['.png'], 2.5)
+
+        file_type.delete()
+        self.assertNotIn('.png', pricing.price_table())
+
+
+class TaskStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='pw')
+        cls.other = User.objects.create_user('other', password='pw')
+        doc, = Doc.objects.bulk_create([Doc(file_path='documents/a.png', size=1, ocr_task_id='task-1')])
+        UserToDoc.objects.create(user=cls.owner, doc=doc)
+
+    def setUp(self):
+        self.backend = mock.Mock(task_status=mock.AsyncMock(return_value={'status': 'SUCCESS'}))
+        patcher = mock.patch('documents.views.get_async_backend_client', mock.AsyncMock(return_value=self.backend))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def status(self, task_id='task-1'):
+        return self.client.get(reverse('task_status', args=[task_id]))
+
+    def test_requires_login(self):
+        self.assertEqual(self.status().status_code, 401)
+
+    def test_owner_gets_the_backend_status(self):
+        self.client.force_login(self.owner)
+        response = self.status()
+        self.assertEqual(response.json(), {'status': 'SUCCESS'})
+        self.backend.task_status.assert_awaited_once_with('task-1')
+
+    def test_other_users_task_looks_unknown(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.status().status_code, 404)
+        self.client.force_login(self.owner)
+        self.assertEqual(self.status('task-2').status_code, 404)
+        self.backend.task_status.assert_not_awaited()
+
+
+class AsyncBackendClientTests(TestCase):
+    def test_one_client_per_loop_closed_with_the_loop(self):
+        async def clients():
+            return await get_async_backend_client(), await get_async_backend_client()
+
+        first, again = asyncio.run(clients())
+        self.assertIs(first, again)
+        self.assertTrue(first.client.is_closed)
+
+        second, _ = asyncio.run(clients())
+        self.assertIsNot(second, first)
+        self.assertTrue(second.client.is_closed)
+
+
+def png_bytes(size=(800, 600)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'white').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def zip_bytes(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+class MediaRootMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root, THUMBNAIL_CACHE_DIR=os.path.join(media_root, 'thumbs'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.media_root = media_root
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(os.path.join(self.media_root, 'docs')) for name in names]
+
+
+@override_settings(THUMBNAIL_FORMAT='JPEG')
+class ThumbnailTests(MediaRootMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='pw')
+        cls.other = User.objects.create_user('other', password='pw')
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, 'docs'))
+        with open(os.path.join(self.media_root, 'docs', 'page.png'), 'wb') as f:
+            f.write(png_bytes())
+        self.doc, = Doc.objects.bulk_create([Doc(file_path='docs/page.png', size=1)])
+        UserToDoc.objects.create(user=self.owner, doc=self.doc)
+        # Eviction runs on the shared executor and is not under test here
+        patcher = mock.patch('documents.thumbnails.evict_thumbnails')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, doc=None):
+        return self.client.get(reverse('thumbnail', args=[(doc or self.doc).pk]))
+
+    def test_requires_login(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(os.path.exists(thumbnails.thumbnail_path(self.doc)))
+
+    def test_generated_on_first_request_and_served_from_cache(self):
+        self.client.force_login(self.owner)
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], thumbnails.CACHE_CONTROL)
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as preview:
+            self.assertLessEqual(max(preview.size), 400)
+
+        with mock.patch('documents.thumbnails.generate_thumbnail') as generate:
+            self.assertEqual(self.get().status_code, 200)
+        generate.assert_not_called()
+
+    def test_other_users_document_looks_missing(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.get().status_code, 404)
+        self.assertFalse(os.path.exists(thumbnails.thumbnail_path(self.doc)))
+
+    def test_pdf_has_no_preview(self):
+        pdf, = Doc.objects.bulk_create([Doc(file_path='docs/scan.pdf', size=1)])
+        UserToDoc.objects.create(user=self.owner, doc=pdf)
+        self.assertIsNone(pdf.thumbnail_url)
+        self.client.force_login(self.owner)
+        self.assertEqual(self.get(pdf).status_code, 404)
+
+    def test_url_changes_with_preview_settings(self):
+        url = self.doc.thumbnail_url
+        with override_settings(THUMBNAIL_SIZE=200):
+            self.assertNotEqual(self.doc.thumbnail_url, url)
+
+
+@override_settings(BULK_UPLOAD_MAX_FILES=3)
+class BulkUploadTests(MediaRootMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='pw')
+        FileType.objects.update_or_create(extension='.png', defaults={'price': 2.0})
+
+    def setUp(self):
+        super().setUp()
+        pricing.invalidate()
+        self.addCleanup(pricing.invalidate)
+
+    def upload(self, name, data):
+        return SimpleUploadedFile(name, data)
+
+    def test_zip_members_and_plain_files_become_documents(self):
+        archive = zip_bytes({'scans/a.png': png_bytes(), 'b.pdf': b'%PDF-1.4', 'notes.txt': b'skip', 'scans/': b''})
+        # Three inserts and the price table, inside the transaction's savepoint
+        with self.assertNumQueries(6):
+            docs = ingest(self.user, [self.upload('batch.zip', archive), self.upload('c.png', png_bytes())])
+
+        names = sorted(os.path.basename(doc.file_path.name) for doc in docs)
+        self.assertEqual(names, ['a.png', 'b.pdf', 'c.png'])
+        self.assertEqual(sorted(self.stored_files()), names)
+        self.assertEqual(UserToDoc.objects.filter(user=self.user).count(), 3)
+        carts = {os.path.basename(cart.doc.file_path.name): cart.order_price for cart in Cart.objects.filter(user=self.user)}
+        self.assertAlmostEqual(carts['c.png'], len(png_bytes()) / 1024 * 2.0)
+
+    def test_too_many_files_stores_nothing(self):
+        archive = zip_bytes({f'{i}.png': png_bytes((10, 10)) for i in range(4)})
+        with self.assertRaisesMessage(BulkUploadError, 'At most 3 files'):
+            ingest(self.user, [self.upload('batch.zip', archive)])
+        self.assertFalse(Doc.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    @override_settings(BULK_UPLOAD_MAX_BYTES=100)
+    def test_archive_expanding_past_the_byte_limit_is_rejected(self):
+        archive = zip_bytes({'big.png': b'\0' * 1000})
+        with self.assertRaisesMessage(BulkUploadError, 'expands beyond'):
+            ingest(self.user, [self.upload('batch.zip', archive)])
+        self.assertEqual(self.stored_files(), [])
+
+    def test_invalid_or_empty_uploads_are_rejected(self):
+        with self.assertRaisesMessage(BulkUploadError, 'not a valid ZIP'):
+            ingest(self.user, [self.upload('broken.zip', b'not a zip')])
+        with self.assertRaisesMessage(BulkUploadError, 'No supported files'):
+            ingest(self.user, [self.upload('notes.txt', b'text')])
+
+    def test_failed_insert_removes_stored_files(self):
+        with mock.patch('documents.bulk.UserToDoc.objects.bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                ingest(self.user, [self.upload('a.png', png_bytes())])
+        self.assertFalse(Doc.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    def test_view_reports_errors_on_the_form(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('bulk_upload'), {'files': [self.upload('notes.txt', b'text')]})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['form'], 'files', 'No supported files found')
+
+    @override_settings(DATA_UPLOAD_MAX_NUMBER_FILES=3)
+    def test_view_rejects_more_parts_than_django_parses(self):
+        self.client.force_login(self.user)
+        files = [self.upload(f'{i}.png', png_bytes((10, 10))) for i in range(4)]
+        response = self.client.post(reverse('bulk_upload'), {'files': files})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['form'], 'files', 'At most 3 files per upload')
+        self.assertFalse(Doc.objects.exists())
+
+    def test_view_redirects_after_upload(self):
+        self.client.force_login(self.user)
+        with mock.patch('documents.views.thumbnails.schedule_thumbnail') as schedule, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('bulk_upload'), {'files': [self.upload('a.png', png_bytes())]})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        schedule.assert_called_once()
\ No newline at end of file
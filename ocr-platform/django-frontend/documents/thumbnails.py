@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Pillow cannot rasterize PDFs; those keep a placeholder in the gallery
+PREVIEWABLE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tiff', '.tif'}
+CONTENT_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+# The doc id and size are part of the version, so a given URL never changes content;
+# previews are private to the document's owner and must not land in shared caches
+CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+_executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbs')
+_evict_lock = threading.Lock()
+
+
+def is_previewable(doc):
+    return os.path.splitext(doc.file_path.name)[1].lower() in PREVIEWABLE_EXTENSIONS
+
+
+def thumbnail_version(doc):
+    # Changes whenever the source file or the preview settings change
+    source = f"{doc.file_path.name}|{doc.size}|{settings.THUMBNAIL_SIZE}|{settings.THUMBNAIL_FORMAT}|{settings.THUMBNAIL_QUALITY}"
+    return hashlib.sha1(source.encode()).hexdigest()[:12]
+
+
+def thumbnail_path(doc):
+    ext = settings.THUMBNAIL_FORMAT.lower()
+    return os.path.join(settings.THUMBNAIL_CACHE_DIR, f"{doc.pk}-{thumbnail_version(doc)}.{ext}")
+
+
+def thumbnail_url(doc):
+    if not is_previewable(doc):
+        return None
+    return f"{reverse('thumbnail', args=[doc.pk])}?v={thumbnail_version(doc)}"
+
+
+def generate_thumbnail(doc):
+    """Render the preview if it is not cached yet and return its path."""
+    path = thumbnail_path(doc)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(settings.THUMBNAIL_CACHE_DIR, exist_ok=True)
+    size = settings.THUMBNAIL_SIZE
+    with Image.open(doc.file_path.path) as img:
+        # Lets the JPEG decoder downscale by 1/2..1/8 instead of decoding full resolution
+        img.draft('RGB', (size, size))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((size, size))
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        if settings.THUMBNAIL_FORMAT == 'JPEG' and img.mode == 'RGBA':
+            img = img.convert('RGB')
+
+        # Concurrent generators of the same preview each write their own file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        img.save(tmp_path, settings.THUMBNAIL_FORMAT, quality=settings.THUMBNAIL_QUALITY)
+    os.replace(tmp_path, path)
+
+    try:
+        _executor.submit(evict_thumbnails)
+    except RuntimeError:
+        # Interpreter shutdown; the next preview triggers eviction instead
+        pass
+    return path
+
+
+def schedule_thumbnail(doc):
+    if is_previewable(doc):
+        _executor.submit(_generate_quietly, doc)
+
+
+def _generate_quietly(doc):
+    try:
+        generate_thumbnail(doc)
+    except Exception:
+        logger.exception("Thumbnail for doc %s failed", doc.pk)
+
+
+def touch(path):
+    # Modification time doubles as the last access time for eviction
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_thumbnails():
+    """Remove least recently used previews until the cache fits the size limit."""
+    if not _evict_lock.acquire(blocking=False):
+        return
+    try:
+        entries = []
+        total = 0
+        with os.scandir(settings.THUMBNAIL_CACHE_DIR) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        if total <= settings.THUMBNAIL_CACHE_MAX_BYTES:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            if total <= settings.THUMBNAIL_CACHE_MAX_BYTES:
+                break
+    finally:
+        _evict_lock.release()
\ No newline at end of file
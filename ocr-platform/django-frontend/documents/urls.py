@@ -3,5 +3,8 @@ from . import views
 
 urlpatterns = [
     path('upload/', views.upload_document, name='upload'),
+    path('upload/bulk/', views.bulk_upload, name='bulk_upload'),
     path('analyze/<int:doc_id>/', views.analyze_document, name='analyze'),
+    path('thumb/<int:doc_id>/', views.thumbnail, name='thumbnail'),
+    path('task/<str:task_id>/status/', views.task_status, name='task_status'),
 ]
\ No newline at end of file
@@ -1,31 +1,41 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.conf import settings
+from django.core.exceptions import TooManyFilesSent
+from django.db import transaction
+from django.http import FileResponse, Http404, JsonResponse
+from asgiref.sync import sync_to_async
 from .models import Doc, UserToDoc, FileType, Cart
-from .forms import DocUploadForm, LoginForm
-import os
-import requests
-import base64
+from .forms import BulkUploadForm, DocUploadForm, LoginForm
+from .bulk import BulkUploadError, ingest
+from .backend_client import BackendError, get_async_backend_client, get_backend_client
+from .pagination import InvalidCursor, KeysetPage, cached_count, invalidate_count
+from . import thumbnails
 
 
 def home(request):
-    # Get all documents for current user if authenticated
-    if request.user.is_authenticated:
-        user_docs = Doc.objects.filter(
-            id__in=UserToDoc.objects.filter(user=request.user).values('doc')
-        ).order_by('-created_at')
-    else:
-        user_docs = Doc.objects.none()
+    page_obj = None
+    total = 0
 
-    # Pagination
-    paginator = Paginator(user_docs, 12)  # 12 items per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Get documents for current user if authenticated, newest first
+    if request.user.is_authenticated:
+        user_links = UserToDoc.objects.filter(user=request.user)
+        try:
+            page_obj = KeysetPage(
+                user_links.select_related('doc'),
+                settings.GALLERY_PAGE_SIZE,
+                after=request.GET.get('after'),
+                before=request.GET.get('before'),
+            )
+        except InvalidCursor:
+            return redirect('home')
+        total = cached_count(request.user.id, user_links)
 
     context = {
         'page_obj': page_obj,
+        'docs': [link.doc for link in page_obj] if page_obj else [],
+        'total': total,
         'media_url': settings.MEDIA_URL
     }
     return render(request, 'home.html', context)
@@ -66,6 +76,10 @@ def upload_document(request):
 
             # Add to cart (automatic price calculation)
             Cart.objects.create(user=request.user, doc=doc)
+            invalidate_count(request.user.id)
+
+            # Render the gallery preview off the request path
+            transaction.on_commit(lambda: thumbnails.schedule_thumbnail(doc))
 
             return redirect('home')
     else:
@@ -74,6 +88,55 @@ def upload_document(request):
     return render(request, 'upload.html', {'form': form})
 
 
+@login_required
+def bulk_upload(request):
+    if request.method == 'POST':
+        try:
+            form = BulkUploadForm(request.POST, request.FILES)
+        except TooManyFilesSent:
+            # Parsing stopped at DATA_UPLOAD_MAX_NUMBER_FILES; report it on the form
+            form = BulkUploadForm({})
+            form.errors['files'] = form.error_class([f"At most {settings.BULK_UPLOAD_MAX_FILES} files per upload"])
+        if form.is_valid():
+            try:
+                docs = ingest(request.user, form.cleaned_data['files'])
+            except BulkUploadError as e:
+                form.add_error('files', str(e))
+            else:
+                invalidate_count(request.user.id)
+                transaction.on_commit(lambda: [thumbnails.schedule_thumbnail(doc) for doc in docs])
+                return redirect('home')
+    else:
+        form = BulkUploadForm()
+
+    return render(request, 'bulk_upload.html', {'form': form})
+
+
+@login_required
+def thumbnail(request, doc_id):
+    doc = get_object_or_404(Doc, id=doc_id)
+    # Same answer for someone else's document as for a missing one
+    if not UserToDoc.objects.filter(user=request.user, doc=doc).exists():
+        raise Http404
+    if not thumbnails.is_previewable(doc):
+        raise Http404
+
+    path = thumbnails.thumbnail_path(doc)
+    try:
+        preview = open(path, 'rb')
+        thumbnails.touch(path)
+    except FileNotFoundError:
+        # First request before the background job finished, or evicted since
+        try:
+            preview = open(thumbnails.generate_thumbnail(doc), 'rb')
+        except (OSError, ValueError):
+            raise Http404
+
+    response = FileResponse(preview, content_type=thumbnails.CONTENT_TYPES[settings.THUMBNAIL_FORMAT])
+    response['Cache-Control'] = thumbnails.CACHE_CONTROL
+    return response
+
+
 @login_required
 def analyze_document(request, doc_id):
     doc = get_object_or_404(Doc, id=doc_id)
@@ -82,44 +145,40 @@ def analyze_document(request, doc_id):
     if not UserToDoc.objects.filter(user=request.user, doc=doc).exists():
         return redirect('home')
 
-    # Prepare FastAPI request
-    fastapi_url = f"{settings.FASTAPI_URL}/upload_doc"
-    file_path = doc.file_path.path
-
-    # Read file and convert to base64
-    with open(file_path, 'rb') as f:
-        file_content = f.read()
-    base64_content = base64.b64encode(file_content).decode('utf-8')
+    # Queue OCR in one call through the shared connection pool; with a shared
+    # media volume only the storage key is sent instead of the file contents
+    # The user id lets the backend keep one user's bulk uploads from starving others
+    client = get_backend_client()
+    owner = str(request.user.pk)
+    try:
+        if settings.BACKEND_SHARED_MEDIA:
+            data = client.register_document(doc.file_path.name, doc.created_at.date(), owner)
+        else:
+            data = client.submit_document(doc.file_path.path, doc.created_at.date(), owner)
+    except BackendError:
+        return render(request, 'analysis_error.html', {'doc': doc})
+
+    task_id = data['task_id']
+    Doc.objects.filter(pk=doc.pk).update(ocr_task_id=task_id)
+    return render(request, 'analysis_started.html', {
+        'doc': doc,
+        'task_id': task_id,
+        'task_events_url': f"{settings.FASTAPI_PUBLIC_URL}/task_events/{task_id}"
+    })
+
+
+async def task_status(request, task_id):
+    # login_required does not wrap async views before Django 5.0
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    # Same answer for someone else's task as for an unknown one
+    if not await UserToDoc.objects.filter(user=user, doc__ocr_task_id=task_id).aexists():
+        return JsonResponse({'error': 'Task not found'}, status=404)
 
-    # Send to FastAPI
     try:
-        response = requests.post(
-            fastapi_url,
-            data={
-                'file_content': f"data:image/jpeg;base64,{base64_content}",
-                'filename': os.path.basename(file_path),
-                'doc_date': '2023-01-01'  # Placeholder date
-            },
-            timeout=30
-        )
-
-        if response.status_code == 201:
-            data = response.json()
-            doc_id_fastapi = data['document_id']
-
-            # Start analysis
-            analyze_url = f"{settings.FASTAPI_URL}/doc_analyse/{doc_id_fastapi}"
-            analyze_response = requests.post(analyze_url)
-
-            if analyze_response.status_code == 202:
-                # Success
-                return render(request, 'analysis_started.html', {
-                    'doc': doc,
-                    'task_id': analyze_response.json()['task_id']
-                })
-
-    except requests.exceptions.RequestException as e:
-        pass
-
-    # If we get here, something went wrong
-    return render(request, 'analysis_error.html', {'doc': doc})
\ No newline at end of file
+        client = await get_async_backend_client()
+        data = await client.task_status(task_id)
+    except BackendError:
+        return JsonResponse({'error': 'Backend unavailable'}, status=502)
+    return JsonResponse(data)
\ No newline at end of file
@@ -1,5 +1,8 @@
 import os
+import time
 from celery import Celery
+from celery.signals import before_task_publish
+from .scheduling import PRIORITY_STEPS, PRIORITY_SEP
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,6 +20,26 @@ celery_app.conf.update(
     timezone='Europe/Moscow',
     enable_utc=True,
     worker_max_tasks_per_child=100,
+    # Tesseract упирается в CPU: по процессу на ядро, без запаса задач в процессе,
+    # чтобы длинная задача не держала за собой очередь из предвыбранных
+    worker_pool='prefork',
+    worker_concurrency=int(os.getenv("OCR_WORKER_CONCURRENCY", os.cpu_count() or 1)),
+    worker_prefetch_multiplier=int(os.getenv("OCR_WORKER_PREFETCH", 1)),
     task_acks_late=True,
+    # Страховка для сообщений без собственных лимитов (см. scheduling.time_limits)
+    task_soft_time_limit=int(os.getenv("OCR_TASK_SOFT_TIME_LIMIT", 1800)),
+    task_time_limit=int(os.getenv("OCR_TASK_TIME_LIMIT", 1830)),
     broker_connection_retry_on_startup=True,
-)
\ No newline at end of file
+    # Приоритеты 0..9 внутри каждой очереди (0 - наивысший), см. scheduling.claim_priority
+    broker_transport_options={
+        'priority_steps': PRIORITY_STEPS,
+        'sep': PRIORITY_SEP,
+        'queue_order_strategy': 'priority',
+    },
+)
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(headers=None, **kwargs):
+    # Момент постановки в очередь: по нему воркер считает время ожидания задачи
+    headers.setdefault("enqueued_at", time.time())
\ No newline at end of file
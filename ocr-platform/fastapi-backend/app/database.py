@@ -1,15 +1,80 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from sqlalchemy import create_engine
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 import os
+import time
+from .metrics import DB_POOL_WAIT_SECONDS
+
+# Пулы соединений: у API и у каждого процесса воркера свои, итоговое число
+# соединений к PostgreSQL - (DB_POOL_SIZE + DB_MAX_OVERFLOW) на процесс
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Меньше таймаутов простоя на стороне PostgreSQL/балансировщика
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# Кэш подготовленных выражений asyncpg на соединение; 0 - для pgbouncer в режиме transaction
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 500))
+# Кэш скомпилированного SQL в SQLAlchemy, общий для движка
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", 1000))
+# Создание схемы при старте API - только для локальной разработки, иначе python -m app.migrate
+DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "false").lower() == "true"
+
+
+class TimedQueuePool(QueuePool):
+    metrics_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.labels(self.metrics_label).observe(time.perf_counter() - started)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.labels(self.metrics_label).observe(time.perf_counter() - started)
+
+
+def engine_options(url: str, poolclass) -> dict:
+    options = {"query_cache_size": DB_QUERY_CACHE_SIZE}
+    if url.startswith("sqlite"):
+        # У SQLite свои классы пулов без размеров (бенчмарки, локальные проверки)
+        return options
+    options.update(
+        poolclass=poolclass,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        # Отброшенные сервером соединения заменяются до выдачи, а не падением запроса
+        pool_pre_ping=True,
+    )
+    return options
+
 
 class Base(DeclarativeBase):
     pass
 
 # Асинхронный движок для FastAPI
-async_engine = create_async_engine(os.getenv("DATABASE_URL"))
+DATABASE_URL = os.getenv("DATABASE_URL")
+async_engine = create_async_engine(
+    DATABASE_URL,
+    **engine_options(DATABASE_URL, TimedAsyncQueuePool),
+    **({"connect_args": {
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    }} if "+asyncpg" in DATABASE_URL else {})
+)
 AsyncSessionLocal = async_sessionmaker(
     bind=async_engine,
     expire_on_commit=False,
@@ -17,7 +82,8 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 # Синхронный движок для Celery
-sync_engine = create_engine(os.getenv("SYNC_DATABASE_URL"))
+SYNC_DATABASE_URL = os.getenv("SYNC_DATABASE_URL")
+sync_engine = create_engine(SYNC_DATABASE_URL, **engine_options(SYNC_DATABASE_URL, TimedQueuePool))
 SyncSessionLocal = sessionmaker(
     bind=sync_engine,
     autocommit=False,
@@ -34,7 +100,14 @@ async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
 
 @asynccontextmanager
 async def lifespan(app):
-    async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Схема создаётся отдельным шагом (python -m app.migrate), старт API без DDL
+    if DB_CREATE_ALL:
+        from . import models  # noqa: F401
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
     yield
+    from .events import task_event_hub, close_async_client
+
+    await task_event_hub.close()
+    await close_async_client()
     await async_engine.dispose()
\ No newline at end of file
@@ -0,0 +1,172 @@
+import os
+import json
+import asyncio
+import logging
+import contextlib
+from collections import defaultdict
+
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+TASK_EVENTS_PREFIX = "ocr:events:"
+TASK_PROGRESS_PREFIX = "ocr:progress:"
+TASK_PROGRESS_TTL = 24 * 3600
+FINAL_STATES = {"SUCCESS", "FAILURE", "REVOKED"}
+TASK_EVENTS_KEEPALIVE = float(os.getenv("TASK_EVENTS_KEEPALIVE", 15))
+
+_client = None
+_async_client = None
+
+
+def task_channel(task_id: str) -> str:
+    return f"{TASK_EVENTS_PREFIX}{task_id}"
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(os.getenv("REDIS_URL"))
+    return _client
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis.from_url(os.getenv("REDIS_URL"))
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+def publish_task_event(task_id: str, state: str, **data) -> None:
+    # Вызывается из воркера; недоступность Redis не должна ронять распознавание
+    if not task_id or not os.getenv("REDIS_URL"):
+        return
+    payload = {"task_id": task_id, "state": state, "final": state in FINAL_STATES, **data}
+    try:
+        get_client().publish(task_channel(task_id), json.dumps(payload))
+    except redis.RedisError as e:
+        logger.warning("Task event for %s not published: %s", task_id, e)
+
+
+def increment_progress(task_id: str) -> int:
+    if not task_id or not os.getenv("REDIS_URL"):
+        return 0
+    key = f"{TASK_PROGRESS_PREFIX}{task_id}"
+    try:
+        pipe = get_client().pipeline()
+        pipe.incr(key)
+        pipe.expire(key, TASK_PROGRESS_TTL)
+        return pipe.execute()[0]
+    except redis.RedisError as e:
+        logger.warning("Task progress for %s not updated: %s", task_id, e)
+        return 0
+
+
+def format_sse(payload: dict) -> str:
+    return f"event: {payload['state'].lower()}\ndata: {json.dumps(payload)}\n\n"
+
+
+def read_progress(task_id: str) -> int:
+    return int(get_client().get(f"{TASK_PROGRESS_PREFIX}{task_id}") or 0)
+
+
+def current_task_event(task_id: str) -> dict:
+    # Исходное состояние для только что подключившегося клиента
+    from .celery_app import celery_app
+
+    task = celery_app.AsyncResult(task_id)
+    state, result = task.status, task.result
+
+    if state == "SUCCESS" and isinstance(result, dict) and result.get("status") == "processing":
+        # Многостраничный документ: итог у задачи сборки, до неё - прогресс по страницам
+        assemble = celery_app.AsyncResult(result["assemble_task_id"])
+        if assemble.status not in FINAL_STATES:
+            return {
+                "task_id": task_id,
+                "state": "PROGRESS",
+                "final": False,
+                "doc_id": result["doc_id"],
+                "pages": result["pages"],
+                "done": read_progress(task_id),
+            }
+        state, result = assemble.status, assemble.result
+
+    payload = {"task_id": task_id, "state": state, "final": state in FINAL_STATES}
+    if state == "SUCCESS":
+        payload["result"] = result
+    elif state == "FAILURE":
+        payload["error"] = str(result)
+    return payload
+
+
+class TaskEventHub:
+    """Одна подписка на все события задач на процесс API; события раздаются
+    по очередям клиентов, ожидающих конкретную задачу."""
+
+    def __init__(self):
+        self._queues = defaultdict(set)
+        self._pubsub = None
+        self._reader = None
+        self._lock = asyncio.Lock()
+
+    async def ensure_started(self) -> None:
+        async with self._lock:
+            if self._reader is not None and not self._reader.done():
+                return
+            self._pubsub = get_async_client().pubsub()
+            await self._pubsub.psubscribe(f"{TASK_EVENTS_PREFIX}*")
+            self._reader = asyncio.create_task(self._run())
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        await self.ensure_started()
+        queue = asyncio.Queue(maxsize=100)
+        self._queues[task_id].add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue) -> None:
+        queues = self._queues.get(task_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._queues[task_id]
+
+    async def _run(self) -> None:
+        try:
+            async for message in self._pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                task_id = message["channel"].decode()[len(TASK_EVENTS_PREFIX):]
+                queues = self._queues.get(task_id)
+                if not queues:
+                    continue
+                payload = json.loads(message["data"])
+                for queue in list(queues):
+                    if not queue.full():
+                        queue.put_nowait(payload)
+        except Exception as e:
+            logger.warning("Task event subscription lost: %s", e)
+        finally:
+            await self._pubsub.close()
+
+    async def close(self) -> None:
+        # Ожидание отменённого чтения: подписка закрывается в _run до остановки цикла событий
+        if self._reader is not None:
+            self._reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._reader
+            self._reader = None
+        if self._pubsub is not None:
+            # Чтение могло быть отменено до первого шага, не дойдя до своего finally
+            await self._pubsub.close()
+            self._pubsub = None
+
+
+task_event_hub = TaskEventHub()
\ No newline at end of file
@@ -0,0 +1,53 @@
+import os
+import errno
+import random
+
+import redis
+import pytesseract
+from PIL import Image, UnidentifiedImageError
+from celery.exceptions import SoftTimeLimitExceeded
+from pdf2image.exceptions import PDFPageCountError, PDFSyntaxError, PDFPopplerTimeoutError
+from sqlalchemy.exc import OperationalError, InterfaceError
+
+# Повтор с экспоненциальной задержкой; половина задержки случайна, чтобы
+# задачи, упавшие вместе, не повторялись одновременно
+OCR_MAX_RETRIES = int(os.getenv("OCR_MAX_RETRIES", 5))
+OCR_RETRY_BACKOFF = float(os.getenv("OCR_RETRY_BACKOFF", 10))
+OCR_RETRY_BACKOFF_MAX = float(os.getenv("OCR_RETRY_BACKOFF_MAX", 600))
+
+# Входные данные, которые повтор не исправит: битый или неподдерживаемый файл,
+# превышение лимита времени на нём. MemoryError - тоже постоянная: повтор той же
+# страницы с теми же лимитами снова исчерпает память и рискует OOM-kill воркера
+PERMANENT_ERRORS = (
+    FileNotFoundError, IsADirectoryError,
+    UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, EOFError,
+    PDFPageCountError, PDFSyntaxError, PDFPopplerTimeoutError,
+    pytesseract.TesseractError,
+    SoftTimeLimitExceeded, MemoryError,
+)
+# Сбои окружения: БД, Redis, нехватка системных ресурсов, не найденный бинарник tesseract
+TRANSIENT_ERRORS = (
+    OperationalError, InterfaceError,
+    redis.RedisError,
+    ConnectionError, TimeoutError,
+    pytesseract.TesseractNotFoundError,
+)
+TRANSIENT_ERRNOS = {errno.EAGAIN, errno.ENOMEM, errno.EMFILE, errno.ENFILE, errno.ENOSPC, errno.EIO}
+
+
+def is_transient(exc: BaseException) -> bool:
+    # Неизвестная ошибка считается постоянной: повтор ошибки в коде только тратит воркеры
+    if isinstance(exc, PERMANENT_ERRORS):
+        return False
+    if isinstance(exc, TRANSIENT_ERRORS):
+        return True
+    return isinstance(exc, OSError) and exc.errno in TRANSIENT_ERRNOS
+
+
+def retry_delay(retries: int) -> float:
+    delay = min(OCR_RETRY_BACKOFF_MAX, OCR_RETRY_BACKOFF * 2 ** retries)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def describe(exc: BaseException) -> str:
+    return f"{type(exc).__name__}: {exc}"[:500]
\ No newline at end of file
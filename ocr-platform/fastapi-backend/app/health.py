@@ -0,0 +1,75 @@
+import os
+import time
+import asyncio
+
+import pytesseract
+from sqlalchemy import text
+
+from .database import async_engine
+from .events import get_async_client
+
+# Проверки дёргают внешние сервисы, поэтому результат переиспользуется между запросами
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", 10))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2))
+
+
+async def check_postgres() -> None:
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def check_redis() -> None:
+    await get_async_client().ping()
+
+
+async def check_tesseract() -> None:
+    proc = await asyncio.create_subprocess_exec(
+        pytesseract.pytesseract.tesseract_cmd, "--version",
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+    )
+    if await proc.wait() != 0:
+        raise RuntimeError(f"tesseract exited with code {proc.returncode}")
+
+
+CHECKS = {
+    "postgresql": check_postgres,
+    "redis": check_redis,
+    "tesseract": check_tesseract,
+}
+
+
+async def run_check(check) -> dict:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(check(), HEALTH_CHECK_TIMEOUT)
+    except Exception as e:
+        return {"status": "error", "error": str(e) or type(e).__name__}
+    return {"status": "ok", "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+class HealthReport:
+    def __init__(self):
+        self._report = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._report is not None and time.monotonic() - self._checked_at < HEALTH_CACHE_TTL
+
+    async def get(self) -> dict:
+        if self._fresh():
+            return self._report
+        # Одновременные запросы ждут одну проверку, а не запускают свою
+        async with self._lock:
+            if not self._fresh():
+                results = await asyncio.gather(*(run_check(check) for check in CHECKS.values()))
+                services = dict(zip(CHECKS, results))
+                self._report = {
+                    "status": "OK" if all(r["status"] == "ok" for r in results) else "DEGRADED",
+                    "services": services,
+                }
+                self._checked_at = time.monotonic()
+            return self._report
+
+
+health_report = HealthReport()
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""Разметка страницы: слова с рамками и уверенностью распознавания.
+
+Хранится упакованной: заголовок, numpy-массив записей фиксированного размера и
+тексты слов через "\\n" (в TSV Tesseract слова не содержат ни \\t, ни \\n),
+всё вместе сжато zlib. Координаты - пиксели исходной страницы (для PDF - при
+PDF_DPI), до предобработки.
+"""
+import zlib
+import struct
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+LAYOUT_MAGIC = b"OCL1"
+HEADER = struct.Struct("<III")
+WORD_DTYPE = np.dtype([
+    ("block", "<u2"), ("par", "<u2"), ("line", "<u2"),
+    ("left", "<u4"), ("top", "<u4"), ("width", "<u4"), ("height", "<u4"),
+    ("conf", "i1"),
+])
+# Уровень слова в TSV Tesseract (1 - страница, 2 - блок, 3 - абзац, 4 - строка)
+TSV_WORD_LEVEL = "5"
+RESULT_HEADER = struct.Struct("<I")
+
+
+class Layout(NamedTuple):
+    width: int
+    height: int
+    words: np.ndarray
+    texts: list
+
+
+def from_tsv(tsv: str, size: tuple = None, ocr_size: tuple = None) -> Layout:
+    """Слова из вывода image_to_data; рамки переводятся из размера ocr_size в size."""
+    rows, texts = [], []
+    for line in tsv.splitlines()[1:]:
+        fields = line.split("\t")
+        if len(fields) < 12 or fields[0] != TSV_WORD_LEVEL or not fields[11].strip():
+            continue
+        rows.append((*fields[2:5], *fields[6:10], float(fields[10])))
+        texts.append(fields[11])
+
+    words = np.zeros(len(rows), dtype=WORD_DTYPE)
+    if rows:
+        values = np.array(rows, dtype=np.float64)
+        size = size or ocr_size
+        scale_x, scale_y = (size[0] / ocr_size[0], size[1] / ocr_size[1]) if size and ocr_size else (1.0, 1.0)
+        for i, name in enumerate(("block", "par", "line")):
+            words[name] = values[:, i]
+        for i, (name, scale) in enumerate(zip(("left", "top", "width", "height"), (scale_x, scale_y) * 2), 3):
+            words[name] = np.round(values[:, i] * scale)
+        words["conf"] = np.clip(np.round(values[:, 7]), -1, 100)
+
+    width, height = size or ocr_size or (0, 0)
+    return Layout(width, height, words, texts)
+
+
+def pack(layout: Layout) -> bytes:
+    body = b"".join((
+        HEADER.pack(layout.width, layout.height, len(layout.texts)),
+        layout.words.tobytes(),
+        "\n".join(layout.texts).encode("utf-8"),
+    ))
+    return LAYOUT_MAGIC + zlib.compress(body)
+
+
+def unpack(data: bytes) -> Layout:
+    if data[:len(LAYOUT_MAGIC)] != LAYOUT_MAGIC:
+        raise ValueError("Unknown layout format")
+    body = zlib.decompress(data[len(LAYOUT_MAGIC):])
+    width, height, count = HEADER.unpack_from(body)
+    offset = HEADER.size + count * WORD_DTYPE.itemsize
+    words = np.frombuffer(body, dtype=WORD_DTYPE, count=count, offset=HEADER.size)
+    texts = body[offset:].decode("utf-8").split("\n") if count else []
+    return Layout(width, height, words, texts)
+
+
+def select(layout: Layout, bbox: tuple = None, min_conf: int = None) -> Layout:
+    """Слова, рамка которых пересекается с bbox = (x0, y0, x1, y1)."""
+    words = layout.words
+    mask = np.ones(len(words), dtype=bool)
+    if bbox:
+        x0, y0, x1, y1 = bbox
+        right = words["left"].astype(np.int64) + words["width"]
+        bottom = words["top"].astype(np.int64) + words["height"]
+        mask &= (words["left"] < x1) & (right > x0) & (words["top"] < y1) & (bottom > y0)
+    if min_conf is not None:
+        mask &= words["conf"] >= min_conf
+    indices = np.flatnonzero(mask)
+    return Layout(layout.width, layout.height, words[indices], [layout.texts[i] for i in indices])
+
+
+def to_text(layout: Layout) -> str:
+    # Слова одной строки - через пробел, строки - через перевод строки
+    lines, previous = [], None
+    for word, text in zip(layout.words, layout.texts):
+        key = (word["block"], word["par"], word["line"])
+        if key != previous:
+            lines.append([])
+            previous = key
+        lines[-1].append(text)
+    return "\n".join(" ".join(line) for line in lines)
+
+
+def to_json(layout: Layout) -> dict:
+    # По столбцам: компактнее списка объектов на каждое слово
+    words = {name: layout.words[name].tolist() for name in WORD_DTYPE.names}
+    words["text"] = layout.texts
+    return {"width": layout.width, "height": layout.height, "count": len(layout.texts), "words": words}
+
+
+def pack_result(text: str, layout: Optional[bytes]) -> bytes:
+    """Текст и упакованная разметка одним значением - для кэша OCR."""
+    encoded = text.encode("utf-8")
+    return RESULT_HEADER.pack(len(encoded)) + encoded + (layout or b"")
+
+
+def unpack_result(value: bytes) -> tuple:
+    length, = RESULT_HEADER.unpack_from(value)
+    start = RESULT_HEADER.size
+    text = value[start:start + length].decode("utf-8")
+    return text, value[start + length:] or None
\ No newline at end of file
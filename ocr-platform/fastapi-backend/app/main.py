@@ -1,12 +1,36 @@
 import os
+import time
+import asyncio
 from datetime import date
 import base64
-from fastapi import FastAPI, HTTPException, status, Form, Path, Depends
-from fastapi.responses import JSONResponse
-from sqlalchemy import select
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import FastAPI, status, Form, Path, Query, Depends, File, UploadFile, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from sqlalchemy import select, update, case, or_, and_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from .database import lifespan, get_async_db, Base
-from .models import Document, DocumentText
+from .database import lifespan, get_async_db
+from .models import Document, DocumentText, DocumentPage, OCR_QUEUED, OCR_PROCESSING, OCR_IN_FLIGHT
+from .storage import (
+    BlobWriter, StoredBlob, store_bytes, store_stream, remove_blob, resolve_shared_path, adopt_file
+)
+from .schemas import BatchAnalyseRequest, RegisterDocumentRequest
+from .events import task_event_hub, current_task_event, format_sse, TASK_EVENTS_KEEPALIVE, FINAL_STATES
+from .health import health_report
+from .layout import unpack, select as select_words, to_text, to_json
+from .texts import (
+    TEXT_GZIP_MIN_SIZE, text_etag, etag_matches, cached_etag, store_etag, forget_etag,
+    accepts_gzip, iter_text_json, gzip_chunks
+)
+from .scheduling import (
+    LANES, DEAD_LETTER_QUEUE, estimate_cost, lane_for, time_limits, task_options, claim_priority,
+    claim_priorities, lane_stats
+)
+from .metrics import UPLOAD_BYTES, UPLOAD_DECODE_SECONDS, DISK_WRITE_SECONDS, render_latest
 
 app = FastAPI(
     title="Document OCR Service",
@@ -23,8 +47,160 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-DOCUMENTS_DIR = "documents"
-os.makedirs(DOCUMENTS_DIR, exist_ok=True)
+# Браузер подписывается на события задач напрямую, со страниц Django-фронтенда
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=os.getenv("CORS_ORIGINS", "http://localhost:8001").split(","),
+    allow_methods=["GET"],
+)
+
+
+
+# Документ в работе, задача которого не обновляла его состояние это время, считается потерянным
+OCR_INFLIGHT_TIMEOUT = int(os.getenv("OCR_INFLIGHT_TIMEOUT", 3600))
+# Ожидание в очереди отсчитывается отдельно: при длинной очереди документ ждёт дольше
+# любого таймаута задачи. Перезахват безопасен: старое сообщение воркер пропустит
+OCR_QUEUED_TIMEOUT = int(os.getenv("OCR_QUEUED_TIMEOUT", 24 * 3600))
+
+
+async def claim_documents(db: AsyncSession, task_ids: dict) -> set:
+    """Условный UPDATE ... RETURNING: захватываются только документы без задачи в работе."""
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(Document)
+        .where(
+            Document.id.in_(list(task_ids)),
+            or_(
+                Document.ocr_status.is_(None),
+                Document.ocr_status.not_in(OCR_IN_FLIGHT),
+                and_(
+                    Document.ocr_status == OCR_QUEUED,
+                    Document.ocr_updated_at < now - timedelta(seconds=OCR_QUEUED_TIMEOUT),
+                ),
+                and_(
+                    Document.ocr_status == OCR_PROCESSING,
+                    Document.ocr_updated_at < now - timedelta(seconds=OCR_INFLIGHT_TIMEOUT),
+                ),
+            )
+        )
+        .values(ocr_status=OCR_QUEUED, ocr_task_id=case(task_ids, value=Document.id), ocr_updated_at=now)
+        .returning(Document.id)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = set(result.scalars().all())
+    await db.commit()
+    return claimed
+
+
+async def release_documents(db: AsyncSession, task_ids: list) -> None:
+    # Задачи не удалось опубликовать: документы снова можно поставить в очередь
+    await db.execute(
+        update(Document)
+        .where(Document.ocr_task_id.in_(task_ids), Document.ocr_status == OCR_QUEUED)
+        .values(ocr_status=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def in_flight_tasks(db: AsyncSession, doc_ids) -> dict:
+    result = await db.execute(select(Document.id, Document.ocr_task_id).filter(Document.id.in_(list(doc_ids))))
+    return {row.id: row.ocr_task_id for row in result.all()}
+
+
+def send_ocr_task(doc: Document, task_id: str, owner: str = None) -> None:
+    from .celery_app import celery_app
+
+    # Документы, загруженные до появления оценки стоимости, оцениваются здесь
+    cost = doc.cost if doc.cost is not None else estimate_cost(doc.path).cost
+    celery_app.send_task(
+        'process_ocr_task',
+        args=[doc.id],
+        task_id=task_id,
+        priority=claim_priority(owner),
+        **task_options(cost)
+    )
+
+
+async def enqueue_ocr(db: AsyncSession, doc: Document, owner: str = None) -> tuple:
+    """Возвращает (task_id, queued); queued=False - документ уже распознаётся этой задачей."""
+    from celery.utils import uuid
+
+    task_id = uuid()
+    if doc.id not in await claim_documents(db, {doc.id: task_id}):
+        return (await in_flight_tasks(db, [doc.id]))[doc.id], False
+
+    try:
+        await run_in_threadpool(send_ocr_task, doc, task_id, owner)
+    except Exception:
+        await release_documents(db, [task_id])
+        raise
+    return task_id, True
+
+
+async def add_reference(db: AsyncSession, sha256: str) -> Optional[Document]:
+    # Повторная загрузка - ещё одна ссылка на запись; строку блокирует удаление (delete_document)
+    result = await db.execute(
+        update(Document)
+        .where(Document.sha256 == sha256)
+        .values(ref_count=Document.ref_count + 1)
+        .returning(Document.id)
+        .execution_options(synchronize_session=False)
+    )
+    doc_id = result.scalar()
+    await db.commit()
+    return await db.get(Document, doc_id) if doc_id else None
+
+
+async def register_document(
+        db: AsyncSession,
+        blob: StoredBlob,
+        doc_date: date,
+        analyse: bool = False,
+        owner: str = None
+) -> JSONResponse:
+    # Одинаковое содержимое -> один blob и одна запись Document
+    doc = await add_reference(db, blob.sha256)
+    duplicate = doc is not None
+
+    if not duplicate:
+        estimate = await run_in_threadpool(estimate_cost, blob.path)
+        doc = Document(
+            path=blob.path, date=doc_date, sha256=blob.sha256, page_count=estimate.pages, cost=estimate.cost
+        )
+        db.add(doc)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Параллельная загрузка тех же байтов успела создать запись
+            await db.rollback()
+            doc = await add_reference(db, blob.sha256)
+            if doc is None:
+                raise
+            duplicate = True
+        else:
+            await db.refresh(doc)
+
+    if duplicate and blob.path != doc.path:
+        # Те же байты с другим расширением: новый blob ни на что не ссылается
+        await run_in_threadpool(remove_blob, blob.path)
+
+    content = {
+        "status": "success",
+        "document_id": doc.id,
+        "duplicate": duplicate,
+        "sha256": blob.sha256,
+        "path": doc.path,
+        "date": doc.date.isoformat()
+    }
+    if analyse:
+        # Загрузка и постановка в очередь OCR за один запрос
+        content["task_id"], content["queued"] = await enqueue_ocr(db, doc, owner)
+
+    return JSONResponse(
+        content=content,
+        status_code=status.HTTP_200_OK if duplicate else status.HTTP_201_CREATED
+    )
 
 
 @app.get(
@@ -40,6 +216,57 @@ async def health_check():
     })
 
 
+@app.get(
+    "/health",
+    status_code=status.HTTP_200_OK,
+    summary="Проверка доступности PostgreSQL, Redis и Tesseract",
+    tags=["System"]
+)
+async def readiness_check():
+    report = await health_report.get()
+    return JSONResponse(
+        content=report,
+        status_code=status.HTTP_200_OK if report["status"] == "OK" else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+@app.get(
+    "/metrics",
+    summary="Метрики Prometheus",
+    tags=["System"]
+)
+async def metrics():
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get(
+    "/queues",
+    status_code=status.HTTP_200_OK,
+    summary="Глубина и время ожидания очередей OCR",
+    tags=["System"]
+)
+async def queue_stats():
+    try:
+        lanes = await run_in_threadpool(lambda: {lane: lane_stats(lane) for lane in (*LANES, DEAD_LETTER_QUEUE)})
+    except Exception as e:
+        return JSONResponse(
+            content={"error": f"Broker unavailable: {str(e)}"},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return JSONResponse(content={"lanes": lanes})
+
+
+@app.get(
+    "/ocr_cache/stats",
+    status_code=status.HTTP_200_OK,
+    summary="Статистика кэша результатов OCR",
+    tags=["System"]
+)
+async def ocr_cache_stats():
+    from .ocr_cache import get_ocr_cache
+    return JSONResponse(content=await run_in_threadpool(get_ocr_cache().stats))
+
+
 @app.post(
     "/upload_doc",
     status_code=status.HTTP_201_CREATED,
@@ -56,29 +283,114 @@ async def upload_document(
         if "," in file_content:
             file_content = file_content.split(",")[1]
 
-        file_data = base64.b64decode(file_content)
+        with UPLOAD_DECODE_SECONDS.time():
+            file_data = base64.b64decode(file_content)
+        UPLOAD_BYTES.labels("upload_doc").observe(len(file_data))
 
-        base_name, ext = os.path.splitext(filename)
-        counter = 1
-        file_path = os.path.join(DOCUMENTS_DIR, filename)
-        while os.path.exists(file_path):
-            file_path = os.path.join(DOCUMENTS_DIR, f"{base_name}_{counter}{ext}")
-            counter += 1
+        started = time.perf_counter()
+        blob = await run_in_threadpool(store_bytes, file_data, filename)
+        DISK_WRITE_SECONDS.labels("upload_doc").observe(time.perf_counter() - started)
 
-        with open(file_path, "wb") as f:
-            f.write(file_data)
+        return await register_document(db, blob, doc_date)
 
-        doc = Document(path=file_path, date=doc_date)
-        db.add(doc)
-        await db.commit()
-        await db.refresh(doc)
+    except Exception as e:
+        if db.is_active:
+            await db.rollback()
+        return JSONResponse(
+            content={"error": f"Error processing document: {str(e)}"},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
-        return JSONResponse(content={
-            "status": "success",
-            "document_id": doc.id,
-            "path": file_path,
-            "date": doc_date.isoformat()
-        }, status_code=status.HTTP_201_CREATED)
+
+@app.post(
+    "/upload_file",
+    status_code=status.HTTP_201_CREATED,
+    summary="Загрузка документа (multipart)",
+    tags=["Documents"]
+)
+async def upload_document_file(
+        file: UploadFile = File(...),
+        doc_date: date = Form(...),
+        analyse: bool = Form(False),
+        owner: str = Form(None, max_length=64),
+        db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        # Копирование блоками в пуле потоков, чтобы не блокировать event loop
+        started = time.perf_counter()
+        blob = await run_in_threadpool(store_stream, file.file, file.filename)
+        DISK_WRITE_SECONDS.labels("upload_file").observe(time.perf_counter() - started)
+        UPLOAD_BYTES.labels("upload_file").observe(file.size or 0)
+
+        return await register_document(db, blob, doc_date, analyse, owner)
+
+    except Exception as e:
+        if db.is_active:
+            await db.rollback()
+        return JSONResponse(
+            content={"error": f"Error processing document: {str(e)}"},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    finally:
+        await file.close()
+
+
+@app.post(
+    "/upload_raw",
+    status_code=status.HTTP_201_CREATED,
+    summary="Загрузка документа (application/octet-stream)",
+    tags=["Documents"]
+)
+async def upload_document_raw(
+        request: Request,
+        filename: str = Query(...),
+        doc_date: date = Query(...),
+        analyse: bool = Query(False),
+        owner: str = Query(None, max_length=64),
+        db: AsyncSession = Depends(get_async_db)
+):
+    writer = None
+    try:
+        writer = await run_in_threadpool(BlobWriter, filename)
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(writer.write, chunk)
+        UPLOAD_BYTES.labels("upload_raw").observe(writer.size)
+        blob = await run_in_threadpool(writer.commit)
+        writer = None
+
+        return await register_document(db, blob, doc_date, analyse, owner)
+
+    except Exception as e:
+        if writer is not None:
+            writer.abort()
+        if db.is_active:
+            await db.rollback()
+        return JSONResponse(
+            content={"error": f"Error processing document: {str(e)}"},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@app.post(
+    "/register_doc",
+    status_code=status.HTTP_201_CREATED,
+    summary="Регистрация документа с общего тома без копирования",
+    tags=["Documents"]
+)
+async def register_shared_document(
+        request: RegisterDocumentRequest,
+        db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        path = resolve_shared_path(request.storage_key)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        blob = await run_in_threadpool(adopt_file, path)
+
+        return await register_document(db, blob, request.doc_date, request.analyse, request.owner)
 
     except Exception as e:
         if db.is_active:
@@ -100,7 +412,8 @@ async def delete_document(
         db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        result = await db.execute(select(Document).filter(Document.id == doc_id))
+        # Блокировка строки: параллельная загрузка тех же байтов ждёт решения об удалении
+        result = await db.execute(select(Document).filter(Document.id == doc_id).with_for_update())
         doc = result.scalars().first()
         if not doc:
             return JSONResponse(
@@ -109,21 +422,34 @@ async def delete_document(
             )
 
         file_path = doc.path
+        references = doc.ref_count - 1
+        if references > 0:
+            # Те же байты загружены ещё раз: снимается только одна ссылка
+            doc.ref_count = references
+            await db.commit()
+            return JSONResponse(content={
+                "status": "success",
+                "document_id": doc_id,
+                "file_deleted": False,
+                "references": references,
+                "path": file_path
+            })
+
         await db.delete(doc)
         await db.commit()
+        await forget_etag(doc_id)
 
         file_deleted = False
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-                file_deleted = True
-            except:
-                pass
+        try:
+            file_deleted = remove_blob(file_path)
+        except:
+            pass
 
         return JSONResponse(content={
             "status": "success",
             "document_id": doc_id,
             "file_deleted": file_deleted,
+            "references": 0,
             "path": file_path
         })
 
@@ -136,6 +462,193 @@ async def delete_document(
         )
 
 
+OCR_BATCH_CHUNK_SIZE = int(os.getenv("OCR_BATCH_CHUNK_SIZE", 1))
+
+
+def plan_batch(docs: list, chunk_size: int) -> list:
+    """Раскладка пакета по очередям стоимости и сообщениям: [(lane, task_id, doc_ids, cost)]."""
+    from celery.utils import uuid
+
+    lanes = {}
+    for doc in docs:
+        cost = doc.cost if doc.cost is not None else estimate_cost(doc.path).cost
+        lanes.setdefault(lane_for(cost), []).append((doc.id, cost))
+    plan = []
+    for lane, items in lanes.items():
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            plan.append((lane, uuid(), [doc_id for doc_id, _ in chunk], sum(cost for _, cost in chunk)))
+    return plan
+
+
+def publish_batch(plan: list, owner: str = None):
+    from celery import group
+    from .celery_app import celery_app
+
+    # Приоритет сообщения - по номеру его первого документа среди отправленных владельцем
+    priorities = claim_priorities(owner, sum(len(doc_ids) for _, _, doc_ids, _ in plan))
+
+    tasks = []
+    position = 0
+    for lane, task_id, doc_ids, cost in plan:
+        priority = priorities[position]
+        position += len(doc_ids)
+        if len(doc_ids) > 1:
+            # Несколько документов в одном сообщении; при исчерпании лимита
+            # оставшиеся документы уходят отдельными задачами (process_ocr_chunk)
+            task = celery_app.signature('process_ocr_chunk_task', args=(doc_ids,))
+        else:
+            task = celery_app.signature('process_ocr_task', args=(doc_ids[0],))
+        # Лимит времени сообщения - по суммарной стоимости его документов
+        tasks.append(task.set(queue=lane, priority=priority, task_id=task_id, **time_limits(cost)))
+
+    # group публикует все сообщения через одно соединение продюсера
+    batch = group(tasks).apply_async()
+    batch.save()
+    return batch
+
+
+def fetch_results(backend, task_ids: list) -> list:
+    # Статусы задач одним MGET вместо запроса на каждую задачу
+    if not task_ids:
+        return []
+    keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+    values = backend.mget(keys)
+    if isinstance(values, dict):
+        values = [values.get(key) for key in keys]
+    return [backend.decode_result(value) if value else {"status": "PENDING"} for value in values]
+
+
+def result_items(meta: dict) -> list:
+    # Пакетное сообщение возвращает список результатов, обычная задача - один
+    results = meta.get("result")
+    return results if isinstance(results, list) else [results]
+
+
+def is_dispatched(item) -> bool:
+    return isinstance(item, dict) and item.get("status") == "processing" and "assemble_task_id" in item
+
+
+def collect_batch_status(batch_id: str):
+    from celery.result import GroupResult
+    from .celery_app import celery_app
+
+    batch = GroupResult.restore(batch_id, app=celery_app)
+    if batch is None:
+        return None
+
+    backend = celery_app.backend
+    metas = fetch_results(backend, [r.id for r in batch.results])
+
+    # Многостраничный документ готов не когда разослал страницы, а когда завершилась его сборка
+    assemble_ids = [
+        item["assemble_task_id"]
+        for meta in metas if meta["status"] == "SUCCESS"
+        for item in result_items(meta) if is_dispatched(item)
+    ]
+    assembled = dict(zip(assemble_ids, fetch_results(backend, assemble_ids)))
+
+    states = {}
+    errors = 0
+    for meta in metas:
+        state = meta["status"]
+        items = []
+        if state == "SUCCESS":
+            for item in result_items(meta):
+                if is_dispatched(item):
+                    assemble = assembled[item["assemble_task_id"]]
+                    if assemble["status"] not in FINAL_STATES:
+                        state = "PROGRESS"
+                    item = assemble.get("result") if assemble["status"] == "SUCCESS" else {"status": "error"}
+                items.append(item)
+        states[state] = states.get(state, 0) + 1
+        if state == "SUCCESS":
+            errors += sum(1 for item in items if isinstance(item, dict) and item.get("status") == "error")
+
+    total = len(batch.results)
+    completed = sum(states.get(state, 0) for state in FINAL_STATES)
+    return {
+        "batch_id": batch_id,
+        "total": total,
+        "completed": completed,
+        "progress": round(completed / total, 4) if total else 1.0,
+        "states": states,
+        "errors": errors,
+    }
+
+
+@app.post(
+    "/doc_analyse/batch",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Пакетный запуск анализа документов",
+    tags=["OCR Processing"]
+)
+async def analyse_documents_batch(
+        request: BatchAnalyseRequest,
+        db: AsyncSession = Depends(get_async_db)
+):
+    doc_ids = list(dict.fromkeys(request.doc_ids))
+    result = await db.execute(
+        select(Document.id, Document.path, Document.cost).filter(Document.id.in_(doc_ids))
+    )
+    found = {row.id: row for row in result.all()}
+
+    missing = [doc_id for doc_id in doc_ids if doc_id not in found]
+    docs = [found[doc_id] for doc_id in doc_ids if doc_id in found]
+    if not docs:
+        return JSONResponse(
+            content={"error": "None of the documents were found", "missing": missing},
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+
+    chunk_size = request.chunk_size or OCR_BATCH_CHUNK_SIZE
+    plan = await run_in_threadpool(plan_batch, docs, chunk_size)
+
+    # Документы, уже стоящие в очереди или распознаваемые, из пакета исключаются
+    claimed = await claim_documents(db, {
+        doc_id: task_id for _, task_id, doc_ids, _ in plan for doc_id in doc_ids
+    })
+    in_flight = await in_flight_tasks(db, {doc.id for doc in docs} - claimed)
+    plan = [
+        (lane, task_id, [doc_id for doc_id in doc_ids if doc_id in claimed], cost)
+        for lane, task_id, doc_ids, cost in plan
+    ]
+    plan = [item for item in plan if item[2]]
+
+    batch = None
+    if plan:
+        try:
+            batch = await run_in_threadpool(publish_batch, plan, request.owner)
+        except Exception:
+            await release_documents(db, [task_id for _, task_id, _, _ in plan])
+            raise
+
+    return JSONResponse(content={
+        "status": "processing",
+        "batch_id": batch.id if batch else None,
+        "queued": len(claimed),
+        "tasks": len(batch.results) if batch else 0,
+        "in_flight": {str(doc_id): task_id for doc_id, task_id in in_flight.items()},
+        "missing": missing
+    }, status_code=status.HTTP_202_ACCEPTED)
+
+
+@app.get(
+    "/batch_status/{batch_id}",
+    status_code=status.HTTP_200_OK,
+    summary="Проверка статуса пакета задач",
+    tags=["OCR Processing"]
+)
+async def get_batch_status(batch_id: str):
+    response = await run_in_threadpool(collect_batch_status, batch_id)
+    if response is None:
+        return JSONResponse(
+            content={"error": f"Batch {batch_id} not found"},
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    return JSONResponse(content=response)
+
+
 @app.post(
     "/doc_analyse/{doc_id}",
     status_code=status.HTTP_202_ACCEPTED,
@@ -144,6 +657,7 @@ async def delete_document(
 )
 async def analyse_document(
         doc_id: int = Path(..., gt=0),
+        owner: str = Query(None, max_length=64),
         db: AsyncSession = Depends(get_async_db)
 ):
     result = await db.execute(select(Document).filter(Document.id == doc_id))
@@ -154,13 +668,13 @@ async def analyse_document(
             status_code=status.HTTP_404_NOT_FOUND
         )
 
-    from .celery_app import celery_app
-    task = celery_app.send_task('process_ocr_task', args=[doc_id], queue='ocr_queue')
+    task_id, queued = await enqueue_ocr(db, doc, owner)
 
     return JSONResponse(content={
         "status": "processing",
-        "task_id": task.id,
-        "doc_id": doc_id
+        "task_id": task_id,
+        "doc_id": doc_id,
+        "queued": queued
     }, status_code=status.HTTP_202_ACCEPTED)
 
 
@@ -171,19 +685,99 @@ async def analyse_document(
     tags=["OCR Processing"]
 )
 async def get_task_status(task_id: str):
-    from .celery_app import celery_app
-    task = celery_app.AsyncResult(task_id)
-
-    response = {"task_id": task_id, "status": task.status}
+    # Для многостраничного документа - состояние задачи сборки, до неё PROGRESS
+    event = await run_in_threadpool(current_task_event, task_id)
 
-    if task.status == 'SUCCESS':
-        response['result'] = task.result
-    elif task.status == 'FAILURE':
-        response['error'] = str(task.result)
+    response = {"task_id": task_id, "status": event["state"]}
+    for key in ("result", "error", "doc_id", "pages", "done"):
+        if key in event:
+            response[key] = event[key]
 
     return JSONResponse(content=response)
 
 
+@app.get(
+    "/task_events/{task_id}",
+    status_code=status.HTTP_200_OK,
+    summary="Поток изменений статуса задачи (Server-Sent Events)",
+    tags=["OCR Processing"]
+)
+async def stream_task_events(task_id: str, request: Request):
+    # Подписка раньше чтения текущего состояния: переход между ними не потеряется
+    queue = await task_event_hub.subscribe(task_id)
+    try:
+        current = await run_in_threadpool(current_task_event, task_id)
+    except Exception:
+        task_event_hub.unsubscribe(task_id, queue)
+        raise
+
+    async def event_stream():
+        try:
+            yield format_sse(current)
+            if current["final"]:
+                return
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(queue.get(), TASK_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    await task_event_hub.ensure_started()
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(payload)
+                if payload["final"]:
+                    return
+        finally:
+            task_event_hub.unsubscribe(task_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get(
+    "/search",
+    status_code=status.HTTP_200_OK,
+    summary="Полнотекстовый поиск по распознанным документам",
+    tags=["Documents"]
+)
+async def search_documents(
+        q: str = Query(..., min_length=1, max_length=500),
+        page: int = Query(1, ge=1),
+        page_size: int = Query(20, ge=1, le=100),
+        db: AsyncSession = Depends(get_async_db)
+):
+    if db.get_bind().dialect.name != "postgresql":
+        return JSONResponse(
+            content={"error": "Full-text search requires PostgreSQL"},
+            status_code=status.HTTP_501_NOT_IMPLEMENTED
+        )
+
+    from .search import search_statement, render_snippet
+
+    # Лишняя строка показывает, есть ли следующая страница, без COUNT(*)
+    result = await db.execute(search_statement(q, page_size + 1, (page - 1) * page_size))
+    rows = result.all()
+
+    return JSONResponse(content={
+        "query": q,
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(rows) > page_size,
+        "results": [
+            {
+                "doc_id": row.id_doc,
+                "rank": round(float(row.rank), 6),
+                "snippet": render_snippet(row.snippet),
+                "path": row.path,
+                "date": row.date.isoformat()
+            }
+            for row in rows[:page_size]
+        ]
+    })
+
+
 @app.get(
     "/get_text/{doc_id}",
     status_code=status.HTTP_200_OK,
@@ -191,11 +785,19 @@ async def get_task_status(task_id: str):
     tags=["Documents"]
 )
 async def get_document_text(
+        request: Request,
         doc_id: int = Path(..., gt=0),
         db: AsyncSession = Depends(get_async_db)
 ):
+    # Текст после распознавания не меняется: совпавший ETag из Redis - ответ без БД
+    if_none_match = request.headers.get("if-none-match")
+    etag = await cached_etag(doc_id)
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**headers, "ETag": etag})
+
     doc_result = await db.execute(
-        select(Document, DocumentText)
+        select(Document.path, Document.date, Document.ocr_status, Document.ocr_error, DocumentText.text)
         .outerjoin(DocumentText, Document.id == DocumentText.id_doc)
         .filter(Document.id == doc_id)
     )
@@ -207,17 +809,82 @@ async def get_document_text(
             status_code=status.HTTP_404_NOT_FOUND
         )
 
-    doc, doc_text = result
+    if result.text is None:
+        # Состояние распознавания объясняет, почему текста нет: ещё в работе или ошибка
+        return JSONResponse(
+            content={
+                "error": f"Text for document ID {doc_id} not found",
+                "ocr_status": result.ocr_status,
+                "ocr_error": result.ocr_error
+            },
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+
+    if etag is None:
+        etag = text_etag(result.text)
+        await store_etag(doc_id, etag)
+    headers["ETag"] = etag
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
-    if not doc_text:
+    # Ответ отдаётся частями; длинный текст сжимается на лету
+    body = iter_text_json({"doc_id": doc_id, "path": result.path, "date": result.date.isoformat()}, result.text)
+    if len(result.text) >= TEXT_GZIP_MIN_SIZE and accepts_gzip(request.headers.get("accept-encoding")):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="application/json", headers=headers)
+
+
+@app.get(
+    "/get_page/{doc_id}/{page_no}",
+    status_code=status.HTTP_200_OK,
+    summary="Текст и разметка слов одной страницы или её области",
+    tags=["Documents"]
+)
+async def get_document_page(
+        doc_id: int = Path(..., gt=0),
+        page_no: int = Path(..., ge=0),
+        bbox: str = Query(None, description="Область x0,y0,x1,y1 в пикселях исходной страницы"),
+        min_conf: int = Query(None, ge=-1, le=100),
+        db: AsyncSession = Depends(get_async_db)
+):
+    region = None
+    if bbox:
+        try:
+            region = tuple(int(v) for v in bbox.split(","))
+        except ValueError:
+            region = ()
+        if len(region) != 4 or region[0] >= region[2] or region[1] >= region[3]:
+            return JSONResponse(
+                content={"error": "bbox must be x0,y0,x1,y1 with x0 < x1 and y0 < y1"},
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+    # Читается только одна строка страницы, а не текст всего документа
+    result = await db.execute(
+        select(DocumentPage.text, DocumentPage.layout)
+        .filter(DocumentPage.id_doc == doc_id, DocumentPage.page_no == page_no)
+    )
+    page = result.first()
+    if not page:
         return JSONResponse(
-            content={"error": f"Text for document ID {doc_id} not found"},
+            content={"error": f"Page {page_no} of document ID {doc_id} not found"},
             status_code=status.HTTP_404_NOT_FOUND
         )
 
-    return JSONResponse(content={
-        "doc_id": doc_id,
-        "text": doc_text.text,
-        "path": doc.path,
-        "date": doc.date.isoformat()
-    })
\ No newline at end of file
+    content = {"doc_id": doc_id, "page_no": page_no, "text": page.text, "layout": None}
+    if page.layout is None:
+        # Страница распознана до появления разметки
+        if region or min_conf is not None:
+            return JSONResponse(
+                content={"error": f"Layout for page {page_no} of document ID {doc_id} not found"},
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        return JSONResponse(content=content)
+
+    layout = unpack(page.layout)
+    if region or min_conf is not None:
+        layout = select_words(layout, region, min_conf)
+        content["text"] = to_text(layout)
+    content["layout"] = to_json(layout)
+    return JSONResponse(content=content)
\ No newline at end of file
@@ -0,0 +1,59 @@
+import os
+import glob
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess, start_http_server
+)
+
+# Воркер Celery - несколько процессов prefork: значения пишутся в файлы этого каталога
+# и собираются родителем. Для API в одном процессе переменная не нужна
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+OCR_METRICS_PORT = int(os.getenv("OCR_METRICS_PORT", 9100))
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+SIZE_BUCKETS = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6)
+FAST_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+OCR_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, 3600)
+
+UPLOAD_BYTES = Histogram("ocr_upload_bytes", "Размер загруженного документа", ["endpoint"], buckets=SIZE_BUCKETS)
+UPLOAD_DECODE_SECONDS = Histogram("ocr_upload_decode_seconds", "Декодирование base64 в upload_doc", buckets=FAST_BUCKETS)
+DISK_WRITE_SECONDS = Histogram("ocr_disk_write_seconds", "Запись загрузки в хранилище", ["endpoint"], buckets=FAST_BUCKETS)
+QUEUE_WAIT_SECONDS = Histogram(
+    "ocr_queue_wait_seconds", "Время задачи в очереди до начала выполнения", ["task", "queue"], buckets=QUEUE_BUCKETS
+)
+IMAGE_OPEN_SECONDS = Histogram("ocr_image_open_seconds", "Открытие/растеризация страницы", buckets=FAST_BUCKETS)
+PREPROCESS_SECONDS = Histogram("ocr_preprocess_seconds", "Предобработка страницы", buckets=FAST_BUCKETS)
+TESSERACT_SECONDS = Histogram("ocr_tesseract_seconds", "Распознавание одной страницы", ["engine"], buckets=OCR_BUCKETS)
+DB_POOL_WAIT_SECONDS = Histogram("ocr_db_pool_wait_seconds", "Получение соединения из пула", ["pool"], buckets=FAST_BUCKETS)
+DB_COMMIT_SECONDS = Histogram("ocr_db_commit_seconds", "Фиксация результатов OCR в БД", ["task"], buckets=FAST_BUCKETS)
+
+CACHE_REQUESTS = Counter("ocr_cache_requests_total", "Обращения к кэшу результатов OCR", ["result"])
+OCR_FAILURES = Counter("ocr_failures_total", "Ошибки распознавания и задач OCR", ["stage"])
+
+
+def registry():
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def render_latest() -> bytes:
+    return generate_latest(registry())
+
+
+def start_worker_metrics_server() -> None:
+    # Вызывается в главном процессе воркера до запуска дочерних
+    if PROMETHEUS_MULTIPROC_DIR:
+        # Файлы от предыдущего запуска исказили бы счётчики
+        for path in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, "*.db")):
+            os.remove(path)
+    start_http_server(OCR_METRICS_PORT, registry=registry())
+
+
+def mark_process_dead(pid: int) -> None:
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""Создание и обновление схемы БД отдельным шагом развёртывания.
+
+    python -m app.migrate
+
+create_all создаёт недостающие таблицы и индексы; изменения существующих
+таблиц перечислены в MIGRATIONS и написаны идемпотентно, поэтому команду можно
+запускать при каждом развёртывании. Параллельные запуски реплик сериализуются
+advisory lock.
+
+Документы, загруженные до дедупликации, получают sha256 (backfill_sha256);
+записи с одинаковым содержимым сливаются в одну с общим счётчиком ссылок.
+"""
+import logging
+
+from sqlalchemy import text
+
+from .database import Base, sync_engine
+from .storage import file_sha256, remove_blob
+from . import models  # noqa: F401 - регистрирует таблицы в Base.metadata
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK_ID = 72_451_001
+
+# Только PostgreSQL: изменения таблиц, созданных предыдущими версиями
+MIGRATIONS = [
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS sha256 VARCHAR(64)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_documents_sha256 ON documents (sha256)",
+    "ALTER TABLE documents_text ADD COLUMN IF NOT EXISTS search_vector TSVECTOR",
+    "CREATE INDEX IF NOT EXISTS ix_documents_text_search_vector ON documents_text USING gin (search_vector)",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS page_count INTEGER",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS cost FLOAT",
+    "ALTER TABLE documents_page ADD COLUMN IF NOT EXISTS layout BYTEA",
+    # Длинные тексты сжимаются TOAST: lz4 быстрее pglz по умолчанию при близкой степени сжатия.
+    # Действует для новых значений; сборка PostgreSQL без lz4 остаётся на pglz
+    """DO $$ BEGIN
+        ALTER TABLE documents_text ALTER COLUMN text SET COMPRESSION lz4;
+        ALTER TABLE documents_page ALTER COLUMN text SET COMPRESSION lz4;
+    EXCEPTION WHEN feature_not_supported THEN
+        RAISE NOTICE 'lz4 is not available, OCR text stays pglz-compressed';
+    END $$""",
+    # Разметка уже сжата zlib: повторное сжатие TOAST только тратит CPU
+    "ALTER TABLE documents_page ALTER COLUMN layout SET STORAGE EXTERNAL",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS ocr_status VARCHAR(16)",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS ocr_task_id VARCHAR(64)",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS ocr_updated_at TIMESTAMP WITHOUT TIME ZONE",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS ocr_error VARCHAR(500)",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS ref_count INTEGER NOT NULL DEFAULT 1",
+    # Один текст на документ: дубли от параллельных задач удаляются перед созданием индекса
+    """DO $$ BEGIN
+        IF to_regclass('ix_documents_text_id_doc') IS NULL THEN
+            DELETE FROM documents_text a USING documents_text b WHERE a.id_doc = b.id_doc AND a.id > b.id;
+            CREATE UNIQUE INDEX ix_documents_text_id_doc ON documents_text (id_doc);
+        END IF;
+    END $$""",
+]
+
+
+def merge_duplicate(conn, duplicate: int, keeper: int) -> None:
+    # Ссылки переходят к сохраняемой записи, а с ними и распознанный текст, если у неё его нет
+    conn.execute(
+        text("UPDATE documents SET ref_count = ref_count + (SELECT ref_count FROM documents WHERE id = :dup) "
+             "WHERE id = :keeper"),
+        {"dup": duplicate, "keeper": keeper}
+    )
+    has_text = conn.execute(text("SELECT 1 FROM documents_text WHERE id_doc = :id"), {"id": keeper}).first()
+    if not has_text:
+        for table in ("documents_text", "documents_page"):
+            conn.execute(text(f"UPDATE {table} SET id_doc = :keeper WHERE id_doc = :dup"),
+                         {"dup": duplicate, "keeper": keeper})
+    for table in ("documents_page", "documents_text"):
+        conn.execute(text(f"DELETE FROM {table} WHERE id_doc = :dup"), {"dup": duplicate})
+    conn.execute(text("DELETE FROM documents WHERE id = :dup"), {"dup": duplicate})
+
+
+def backfill_sha256(conn) -> list:
+    """Возвращает пути blob слитых записей: их удаляют после фиксации транзакции."""
+    rows = conn.execute(text("SELECT id, path FROM documents WHERE sha256 IS NULL ORDER BY id")).all()
+    orphans = []
+    for doc_id, path in rows:
+        try:
+            digest = file_sha256(path)
+        except OSError as e:
+            logger.warning("Document %s: sha256 not backfilled: %s", doc_id, e)
+            continue
+        keeper = conn.execute(
+            text("SELECT id, path FROM documents WHERE sha256 = :sha256"), {"sha256": digest}
+        ).first()
+        if keeper is None:
+            conn.execute(text("UPDATE documents SET sha256 = :sha256 WHERE id = :id"), {"sha256": digest, "id": doc_id})
+            continue
+        logger.info("Document %s has the same content as %s, merged", doc_id, keeper.id)
+        merge_duplicate(conn, doc_id, keeper.id)
+        if path != keeper.path:
+            orphans.append(path)
+    return orphans
+
+
+def migrate(engine=sync_engine) -> None:
+    with engine.begin() as conn:
+        postgres = conn.dialect.name == "postgresql"
+        if postgres:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        Base.metadata.create_all(conn)
+        if postgres:
+            for statement in MIGRATIONS:
+                conn.execute(text(statement))
+        orphans = backfill_sha256(conn)
+    for path in orphans:
+        remove_blob(path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate()
+    logger.info("Schema is up to date")
\ No newline at end of file
@@ -1,8 +1,17 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, String, Date, Text
-from datetime import date
+from sqlalchemy import ForeignKey, String, Date, DateTime, Text, Float, LargeBinary, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from datetime import date, datetime
+from typing import Optional
 from .database import Base
 
+# Состояние распознавания документа; queued и processing - задача уже в работе
+OCR_QUEUED = "queued"
+OCR_PROCESSING = "processing"
+OCR_DONE = "done"
+OCR_FAILED = "failed"
+OCR_IN_FLIGHT = (OCR_QUEUED, OCR_PROCESSING)
+
 
 class Document(Base):
     __tablename__ = "documents"
@@ -10,19 +19,54 @@ class Document(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     path: Mapped[str] = mapped_column(String(255))
     date: Mapped[date] = mapped_column(Date)
+    sha256: Mapped[Optional[str]] = mapped_column(String(64), unique=True, index=True)
+    # Число загрузок с этим содержимым: удаление снимает одну ссылку, запись и blob
+    # удаляются вместе с последней
+    ref_count: Mapped[int] = mapped_column(default=1, server_default="1")
+    # Оценка при загрузке (scheduling.estimate_cost): выбор очереди OCR
+    page_count: Mapped[Optional[int]]
+    cost: Mapped[Optional[float]] = mapped_column(Float)
+    # Повторный запрос анализа, пока задача в работе, получает её id, а не новую задачу
+    ocr_status: Mapped[Optional[str]] = mapped_column(String(16))
+    ocr_task_id: Mapped[Optional[str]] = mapped_column(String(64))
+    ocr_updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    ocr_error: Mapped[Optional[str]] = mapped_column(String(500))
 
     text: Mapped["DocumentText"] = relationship(
         back_populates="document",
         cascade="all, delete-orphan",
         uselist=False
     )
+    pages: Mapped[list["DocumentPage"]] = relationship(
+        back_populates="document",
+        cascade="all, delete-orphan",
+        order_by="DocumentPage.page_no"
+    )
 
 
 class DocumentText(Base):
     __tablename__ = "documents_text"
+    __table_args__ = (
+        Index("ix_documents_text_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    id_doc: Mapped[int] = mapped_column(ForeignKey("documents.id"), unique=True, index=True)
+    text: Mapped[str] = mapped_column(Text)
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR().with_variant(Text(), "sqlite"))
+
+    document: Mapped["Document"] = relationship(back_populates="text")
+
+
+class DocumentPage(Base):
+    __tablename__ = "documents_page"
+    __table_args__ = (UniqueConstraint("id_doc", "page_no"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     id_doc: Mapped[int] = mapped_column(ForeignKey("documents.id"))
+    page_no: Mapped[int]
     text: Mapped[str] = mapped_column(Text)
+    # Слова с рамками и уверенностью (layout.pack); не загружается вместе со страницей
+    layout: Mapped[Optional[bytes]] = mapped_column(LargeBinary, deferred=True)
 
-    document: Mapped["Document"] = relationship(back_populates="text")
\ No newline at end of file
+    document: Mapped["Document"] = relationship(back_populates="pages")
\ No newline at end of file
@@ -0,0 +1,140 @@
+import os
+import shlex
+import logging
+import threading
+from functools import cached_property
+import pytesseract
+from PIL import Image
+from .preprocess import OCR_PREPROCESS, OCR_TARGET_DPI, OCR_MAX_SIDE, preprocess
+from .layout import from_tsv, pack
+from .metrics import PREPROCESS_SECONDS, TESSERACT_SECONDS
+
+if os.getenv("TESSERACT_CMD"):
+    pytesseract.pytesseract.tesseract_cmd = os.getenv("TESSERACT_CMD")
+
+# Параллелизм обеспечивают процессы воркера; собственные потоки OpenMP у Tesseract
+# в каждом из них только конкурируют за те же ядра
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+OCR_LANG = os.getenv("OCR_LANG", "rus+eng")
+TESSERACT_CONFIG = os.getenv("TESSERACT_CONFIG", "")
+OCR_ENGINE = os.getenv("OCR_ENGINE", "pytesseract")
+
+logger = logging.getLogger(__name__)
+
+
+class PytesseractEngine:
+    """Запуск процесса tesseract на каждое изображение."""
+
+    name = "pytesseract"
+
+    @cached_property
+    def version(self) -> str:
+        try:
+            return str(pytesseract.get_tesseract_version())
+        except Exception:
+            return "unknown"
+
+    def image_to_data(self, img: Image.Image) -> tuple:
+        # Один запуск tesseract пишет и текст (.txt), и слова с рамками (.tsv)
+        config = f"-c tessedit_create_txt=1 -c tessedit_create_tsv=1 {TESSERACT_CONFIG}".strip()
+        with pytesseract.pytesseract.save(img) as (temp_name, input_filename):
+            pytesseract.pytesseract.run_tesseract(input_filename, temp_name, "tsv", OCR_LANG, config)
+            with open(f"{temp_name}.txt", encoding="utf-8") as f:
+                text = f.read()
+            with open(f"{temp_name}.tsv", encoding="utf-8") as f:
+                tsv = f.read()
+        return text, tsv
+
+
+class TesserocrEngine:
+    """Один экземпляр TessBaseAPI на процесс воркера: traineddata загружается
+    один раз, изображение передаётся из памяти без временных файлов."""
+
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+
+        options = self.parse_config(TESSERACT_CONFIG)
+        self.api = tesserocr.PyTessBaseAPI(lang=OCR_LANG, oem=options["oem"])
+        if options["psm"] is not None:
+            self.api.SetPageSegMode(options["psm"])
+        for name, value in options["variables"].items():
+            self.api.SetVariable(name, value)
+        self._lock = threading.Lock()
+
+    @cached_property
+    def version(self) -> str:
+        # Версия связанной libtesseract, а не бинарника tesseract в PATH
+        import tesserocr
+
+        return tesserocr.tesseract_version().split()[1]
+
+    @staticmethod
+    def parse_config(config: str) -> dict:
+        # Поддерживается то же подмножество CLI, что и в TESSERACT_CONFIG для pytesseract
+        import tesserocr
+
+        options = {"oem": tesserocr.OEM.DEFAULT, "psm": None, "variables": {}}
+        args = iter(shlex.split(config))
+        for arg in args:
+            if arg == "--oem":
+                options["oem"] = int(next(args))
+            elif arg == "--psm":
+                options["psm"] = int(next(args))
+            elif arg == "-c":
+                name, _, value = next(args).partition("=")
+                options["variables"][name] = value
+        return options
+
+    def image_to_data(self, img: Image.Image) -> tuple:
+        # Recognize выполняется один раз, текст и TSV читаются из его результата
+        with self._lock:
+            self.api.SetImage(img)
+            self.api.Recognize()
+            return self.api.GetUTF8Text(), self.api.GetTSVText(0)
+
+
+ENGINES = {
+    PytesseractEngine.name: PytesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+}
+
+_engines = {}
+
+
+def get_engine(name: str = None):
+    name = name or OCR_ENGINE
+    if name not in _engines:
+        try:
+            _engines[name] = ENGINES[name]()
+        except ImportError:
+            logger.warning("OCR engine %s is not installed, falling back to pytesseract", name)
+            _engines[name] = PytesseractEngine()
+    return _engines[name]
+
+
+def engine_config(engine: str = None) -> str:
+    """Всё, что влияет на результат распознавания, кроме самого изображения и языка.
+
+    Имя и версия берутся у загруженного движка: после отката на pytesseract
+    его результаты не попадают в кэш под ключами tesserocr.
+    """
+    engine = get_engine(engine)
+    return (
+        f"{engine.name}|{engine.version}|{TESSERACT_CONFIG}"
+        f"|preprocess={OCR_PREPROCESS}|dpi={OCR_TARGET_DPI}|side={OCR_MAX_SIDE}"
+    )
+
+
+def ocr_page(img: Image.Image, preprocess_steps: tuple = None, engine: str = None) -> tuple:
+    """Текст страницы и упакованная разметка слов за один проход Tesseract."""
+    size = img.size
+    with PREPROCESS_SECONDS.time():
+        img = preprocess(img, preprocess_steps)
+    engine = get_engine(engine)
+    with TESSERACT_SECONDS.labels(engine.name).time():
+        text, tsv = engine.image_to_data(img)
+    # Рамки пересчитываются в пиксели исходной страницы (после deskew - приближённо)
+    return text, pack(from_tsv(tsv, size, img.size))
\ No newline at end of file
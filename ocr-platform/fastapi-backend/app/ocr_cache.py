@@ -0,0 +1,119 @@
+import os
+import time
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Отдельный экземпляр Redis с вытеснением: ключи результатов и аккордов Celery
+# в основном экземпляре не должны вытесняться вместе с кэшем
+OCR_CACHE_URL = os.getenv("OCR_CACHE_URL") or os.getenv("REDIS_URL")
+OCR_CACHE_BACKEND = os.getenv("OCR_CACHE_BACKEND", "redis" if OCR_CACHE_URL else "memory")
+OCR_CACHE_TTL = int(os.getenv("OCR_CACHE_TTL", 30 * 24 * 3600))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", 1024))
+OCR_CACHE_PREFIX = "ocr:cache:"
+# Формат значения: текст и разметка страницы (layout.pack_result)
+OCR_CACHE_FORMAT = 2
+
+
+def cache_key(content_hash: str, lang: str, config: str) -> str:
+    # Результат зависит от байтов изображения, языков и конфигурации/версии движка (ocr.engine_config)
+    engine = hashlib.sha1(f"{lang}|{config}|{OCR_CACHE_FORMAT}".encode()).hexdigest()[:16]
+    return f"{OCR_CACHE_PREFIX}{content_hash}:{engine}"
+
+
+class MemoryOCRCache:
+    """Локальная замена Redis: LRU на OrderedDict с TTL, в пределах процесса."""
+
+    def __init__(self, max_entries: int = OCR_CACHE_MAX_ENTRIES, ttl: int = OCR_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._data),
+            }
+
+
+class RedisOCRCache:
+    """Кэш в Redis (OCR_CACHE_URL). TTL скользящий: каждое попадание продлевает
+    запись, а вытеснение при нехватке памяти даёт allkeys-lru этого экземпляра."""
+
+    stats_key = f"{OCR_CACHE_PREFIX}stats"
+
+    def __init__(self, url: str, ttl: int = OCR_CACHE_TTL):
+        self.ttl = ttl
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            value = self.client.getex(key, ex=self.ttl)
+            self.client.hincrby(self.stats_key, "misses" if value is None else "hits", 1)
+        except redis.RedisError as e:
+            logger.warning("OCR cache unavailable: %s", e)
+            return None
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        try:
+            self.client.set(key, value, ex=self.ttl)
+        except redis.RedisError as e:
+            logger.warning("OCR cache unavailable: %s", e)
+
+    def stats(self) -> dict:
+        try:
+            counters = self.client.hgetall(self.stats_key)
+        except redis.RedisError as e:
+            logger.warning("OCR cache unavailable: %s", e)
+            return {"backend": "redis", "available": False}
+        return {
+            "backend": "redis",
+            "available": True,
+            "hits": int(counters.get(b"hits", 0)),
+            "misses": int(counters.get(b"misses", 0)),
+        }
+
+
+_cache = None
+
+
+def get_ocr_cache():
+    global _cache
+    if _cache is None:
+        if OCR_CACHE_BACKEND == "redis":
+            _cache = RedisOCRCache(OCR_CACHE_URL)
+        else:
+            _cache = MemoryOCRCache()
+    return _cache
\ No newline at end of file
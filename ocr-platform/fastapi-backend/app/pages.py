@@ -0,0 +1,42 @@
+import os
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+PDF_DPI = int(os.getenv("PDF_DPI", 300))
+
+
+def is_pdf(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(5) == b"%PDF-"
+
+
+def count_pages(path: str) -> int:
+    if is_pdf(path):
+        return int(pdfinfo_from_path(path)["Pages"])
+    # Image.open читает только заголовок; n_frames есть у TIFF/GIF
+    with Image.open(path) as img:
+        return getattr(img, "n_frames", 1)
+
+
+def load_page(path: str, page_no: int) -> Image.Image:
+    # Страницы нумеруются с нуля; в памяти только одна страница документа
+    if is_pdf(path):
+        return convert_from_path(path, dpi=PDF_DPI, first_page=page_no + 1, last_page=page_no + 1)[0]
+
+    with Image.open(path) as img:
+        if page_no:
+            img.seek(page_no)
+        # Кадр декодируется до выхода из with: закрывается только файл, данные остаются
+        img.load()
+        return img
+
+
+def join_pages(texts) -> str:
+    # Tesseract завершает страницу символом \f; в тексте документа он только
+    # разделяет страницы - одинаково для одно- и многостраничных документов
+    return "\f".join(text.rstrip("\f") for text in texts)
+
+
+def iter_pages(path: str):
+    for page_no in range(count_pages(path)):
+        yield load_page(path, page_no)
\ No newline at end of file
@@ -0,0 +1,101 @@
+import os
+import numpy as np
+from PIL import Image
+
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "resize,grayscale")
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", 300))
+# Фото с телефона не несут осмысленного DPI: ограничиваем длинную сторону
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", 2500))
+DESKEW_MAX_ANGLE = float(os.getenv("DESKEW_MAX_ANGLE", 5))
+DESKEW_STEP = 0.25
+DESKEW_SAMPLE = 20000
+
+
+def parse_steps(value: str) -> tuple:
+    steps = tuple(step.strip() for step in value.split(",") if step.strip())
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        raise ValueError(f"Unknown preprocessing steps: {', '.join(sorted(unknown))}")
+    return steps
+
+
+def resize(img: Image.Image) -> Image.Image:
+    scale = 1.0
+    dpi = img.info.get("dpi")
+    if dpi and dpi[0] and dpi[0] > OCR_TARGET_DPI:
+        scale = OCR_TARGET_DPI / float(dpi[0])
+    longest = max(img.size)
+    if longest * scale > OCR_MAX_SIDE:
+        scale = OCR_MAX_SIDE / float(longest)
+    if scale >= 1.0:
+        return img
+
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def grayscale(img: Image.Image) -> Image.Image:
+    return img if img.mode == "L" else img.convert("L")
+
+
+def otsu_threshold(pixels: np.ndarray) -> int:
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    weights = np.cumsum(hist)
+    means = np.cumsum(hist * np.arange(256))
+    total, total_mean = weights[-1], means[-1]
+
+    background = weights
+    foreground = total - weights
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (total_mean * background - means * total) ** 2 / (background * foreground)
+    return int(np.nanargmax(between))
+
+
+def binarize(img: Image.Image) -> Image.Image:
+    pixels = np.asarray(grayscale(img))
+    threshold = otsu_threshold(pixels)
+    return Image.fromarray(np.where(pixels > threshold, 255, 0).astype(np.uint8))
+
+
+def estimate_skew(pixels: np.ndarray) -> float:
+    # Угол, при котором горизонтальная проекция тёмных пикселей самая «резкая»:
+    # строки текста собираются в узкие пики
+    ys, xs = np.nonzero(pixels <= otsu_threshold(pixels))
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > DESKEW_SAMPLE:
+        picked = np.random.default_rng(0).choice(len(ys), DESKEW_SAMPLE, replace=False)
+        ys, xs = ys[picked], xs[picked]
+
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + DESKEW_STEP, DESKEW_STEP):
+        theta = np.deg2rad(angle)
+        rows = np.round(ys * np.cos(theta) - xs * np.sin(theta)).astype(np.int64)
+        profile = np.bincount(rows - rows.min())
+        score = float(np.sum(np.diff(profile).astype(np.float64) ** 2))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def deskew(img: Image.Image) -> Image.Image:
+    gray = grayscale(img)
+    angle = estimate_skew(np.asarray(gray))
+    if abs(angle) < DESKEW_STEP:
+        return img
+    fill = 255 if img.mode in ("L", "1") else (255,) * len(img.getbands())
+    return img.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=fill)
+
+
+STEPS = {
+    "resize": resize,
+    "grayscale": grayscale,
+    "binarize": binarize,
+    "deskew": deskew,
+}
+
+
+def preprocess(img: Image.Image, steps: tuple = None) -> Image.Image:
+    for step in parse_steps(OCR_PREPROCESS) if steps is None else steps:
+        img = STEPS[step](img)
+    return img
\ No newline at end of file
@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import time
+import logging
+from typing import NamedTuple, Optional
+
+import redis
+from PIL import Image
+from pdf2image import pdfinfo_from_path
+
+from .events import get_client
+from .pages import PDF_DPI, is_pdf
+
+logger = logging.getLogger(__name__)
+
+# Очереди по стоимости документа: мелкие задачи не ждут за многостраничными PDF
+LANE_SMALL = "ocr_small"
+LANE_MEDIUM = "ocr_medium"
+LANE_LARGE = "ocr_large"
+LANES = (LANE_SMALL, LANE_MEDIUM, LANE_LARGE)
+# Документы с неисправимой ошибкой; очередь никто не слушает, задачи из неё
+# можно повторить воркером с -Q ocr_dead_letter после исправления причины
+DEAD_LETTER_QUEUE = "ocr_dead_letter"
+
+# Стоимость - мегапиксели по всем страницам плюс поправка на размер файла
+OCR_SMALL_MAX_COST = float(os.getenv("OCR_SMALL_MAX_COST", 16))
+OCR_MEDIUM_MAX_COST = float(os.getenv("OCR_MEDIUM_MAX_COST", 160))
+OCR_COST_PER_MB = float(os.getenv("OCR_COST_PER_MB", 1))
+
+# Лимиты времени задачи растут со стоимостью: мягкий - исключение в задаче,
+# жёсткий (на OCR_TIME_LIMIT_GRACE позже) - перезапуск процесса воркера
+OCR_TIME_LIMIT_BASE = float(os.getenv("OCR_TIME_LIMIT_BASE", 30))
+OCR_TIME_LIMIT_PER_COST = float(os.getenv("OCR_TIME_LIMIT_PER_COST", 2))
+OCR_TIME_LIMIT_MAX = float(os.getenv("OCR_TIME_LIMIT_MAX", 1800))
+OCR_TIME_LIMIT_GRACE = float(os.getenv("OCR_TIME_LIMIT_GRACE", 30))
+
+# Справедливость между владельцами: чем больше документов владелец отправил за
+# окно OCR_FAIR_WINDOW, тем ниже приоритет его новых задач (0 - наивысший)
+OCR_FAIR_WINDOW = int(os.getenv("OCR_FAIR_WINDOW", 600))
+OCR_FAIR_SHARE = int(os.getenv("OCR_FAIR_SHARE", 20))
+MAX_PRIORITY = 9
+PRIORITY_STEPS = list(range(MAX_PRIORITY + 1))
+# Разделитель имени очереди и приоритета у транспорта Redis в kombu
+PRIORITY_SEP = "\x06\x16"
+FAIR_PREFIX = "ocr:fair:"
+
+PAGE_SIZE_RE = re.compile(r"([\d.]+) x ([\d.]+) pts")
+
+
+class CostEstimate(NamedTuple):
+    pages: int
+    cost: float
+
+
+def estimate_cost(path: str) -> CostEstimate:
+    """Оценка по заголовкам файла, без декодирования изображения."""
+    size_mb = 0.0
+    try:
+        size_mb = os.path.getsize(path) / 1e6
+        if is_pdf(path):
+            info = pdfinfo_from_path(path)
+            pages = int(info["Pages"])
+            match = PAGE_SIZE_RE.search(info.get("Page size", ""))
+            width, height = (float(v) for v in match.groups()) if match else (612.0, 792.0)
+            megapixels = (width / 72 * PDF_DPI) * (height / 72 * PDF_DPI) / 1e6
+        else:
+            with Image.open(path) as img:
+                pages = getattr(img, "n_frames", 1)
+                megapixels = img.width * img.height / 1e6
+    except Exception as e:
+        logger.warning("Cost of %s estimated from file size: %s", path, e)
+        pages, megapixels = 1, 0.0
+
+    return CostEstimate(pages, round(pages * megapixels + size_mb * OCR_COST_PER_MB, 3))
+
+
+def lane_for(cost: Optional[float]) -> str:
+    if cost is None or cost <= OCR_SMALL_MAX_COST:
+        return LANE_SMALL
+    if cost <= OCR_MEDIUM_MAX_COST:
+        return LANE_MEDIUM
+    return LANE_LARGE
+
+
+def time_limits(cost: Optional[float]) -> dict:
+    soft = min(OCR_TIME_LIMIT_BASE + (cost or 0) * OCR_TIME_LIMIT_PER_COST, OCR_TIME_LIMIT_MAX)
+    return {"soft_time_limit": round(soft), "time_limit": round(soft + OCR_TIME_LIMIT_GRACE)}
+
+
+def task_options(cost: Optional[float]) -> dict:
+    """Очередь и лимиты времени задачи OCR по стоимости документа или страницы."""
+    return {"queue": lane_for(cost), **time_limits(cost)}
+
+
+def claim_priorities(owner: Optional[str], jobs: int = 1) -> list:
+    """Приоритет каждой из jobs задач по её номеру среди отправленных владельцем.
+
+    Хвост большого пакета получает приоритет ниже, чем его начало, и не
+    задерживает единичные задачи других владельцев.
+    """
+    # Счётчик за окно, а не число задач в работе: не нужно уменьшать его при завершении
+    key = f"{FAIR_PREFIX}{owner or 'anonymous'}"
+    try:
+        pipe = get_client().pipeline()
+        pipe.incrby(key, jobs)
+        pipe.expire(key, OCR_FAIR_WINDOW, nx=True)
+        submitted = pipe.execute()[0] - jobs
+    except redis.RedisError as e:
+        logger.warning("Fair share counter unavailable: %s", e)
+        return [0] * jobs
+    return [min(MAX_PRIORITY, (submitted + i) // OCR_FAIR_SHARE) for i in range(jobs)]
+
+
+def claim_priority(owner: Optional[str]) -> int:
+    return claim_priorities(owner)[0]
+
+
+def queue_for_priority(queue: str, priority: int) -> str:
+    return f"{queue}{PRIORITY_SEP}{priority}" if priority else queue
+
+
+def enqueued_at(message: bytes) -> Optional[float]:
+    try:
+        return json.loads(message)["headers"].get("enqueued_at")
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def lane_stats(queue: str) -> dict:
+    """Глубина очереди по приоритетам и возраст самого старого сообщения."""
+    client = get_client()
+    names = [queue_for_priority(queue, p) for p in PRIORITY_STEPS]
+    pipe = client.pipeline()
+    for name in names:
+        pipe.llen(name)
+        # kombu кладёт сообщения через LPUSH и забирает BRPOP: старейшее - в хвосте
+        pipe.lindex(name, -1)
+    replies = pipe.execute()
+
+    now = time.time()
+    by_priority = {}
+    oldest = None
+    for priority, depth, tail in zip(PRIORITY_STEPS, replies[::2], replies[1::2]):
+        if not depth:
+            continue
+        by_priority[priority] = depth
+        stamp = enqueued_at(tail) if tail else None
+        if stamp is not None and (oldest is None or stamp < oldest):
+            oldest = stamp
+
+    return {
+        "depth": sum(by_priority.values()),
+        "by_priority": by_priority,
+        "oldest_wait_seconds": round(now - oldest, 3) if oldest else 0.0,
+    }
\ No newline at end of file
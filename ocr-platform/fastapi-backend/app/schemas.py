@@ -0,0 +1,22 @@
+import os
+from datetime import date
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 10000))
+
+
+class BatchAnalyseRequest(BaseModel):
+    doc_ids: List[int] = Field(..., min_length=1, max_length=BATCH_MAX_SIZE)
+    # Несколько документов в одном сообщении брокера (celery chunks); 1 - по задаче на документ
+    chunk_size: Optional[int] = Field(None, ge=1, le=1000)
+    # Владелец документов (например, id пользователя фронтенда) для справедливой очереди
+    owner: Optional[str] = Field(None, max_length=64)
+
+
+class RegisterDocumentRequest(BaseModel):
+    # Путь к файлу относительно SHARED_MEDIA_ROOT
+    storage_key: str = Field(..., min_length=1, max_length=1024)
+    doc_date: date
+    analyse: bool = False
+    owner: Optional[str] = Field(None, max_length=64)
\ No newline at end of file
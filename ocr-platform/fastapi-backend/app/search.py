@@ -0,0 +1,110 @@
+import os
+import html
+from functools import reduce
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from .models import Document, DocumentText
+
+# Конфигурации полнотекстового поиска PostgreSQL для языков Tesseract
+LANG_CONFIGS = {
+    "rus": "russian",
+    "eng": "english",
+    "deu": "german",
+    "fra": "french",
+    "spa": "spanish",
+    "ita": "italian",
+}
+SEARCH_CONFIGS = [
+    LANG_CONFIGS[lang]
+    for lang in os.getenv("OCR_LANG", "rus+eng").split("+")
+    if lang in LANG_CONFIGS
+] or ["simple"]
+# ts_headline не экранирует текст документа: совпадения отмечаются управляющими
+# символами, которых нет в выводе Tesseract, а HTML собирается в render_snippet
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+HEADLINE_OPTIONS = f'MaxWords=35, MinWords=15, MaxFragments=2, StartSel="{HIGHLIGHT_START}", StopSel="{HIGHLIGHT_STOP}"'
+BACKFILL_BATCH_SIZE = 1000
+
+
+def search_vector(text):
+    # Документ индексируется во всех конфигурациях: русская морфология + английская
+    return reduce(
+        lambda left, right: left.op("||")(right),
+        (func.to_tsvector(config, text) for config in SEARCH_CONFIGS)
+    )
+
+
+def search_query(query: str):
+    return reduce(
+        lambda left, right: left.op("||")(right),
+        (func.websearch_to_tsquery(config, query) for config in SEARCH_CONFIGS)
+    )
+
+
+def search_vector_for(db: Session, text: str):
+    # Колонка tsvector есть только в PostgreSQL (в SQLite - пустой текстовый вариант)
+    return search_vector(text) if db.get_bind().dialect.name == "postgresql" else None
+
+
+def render_snippet(snippet: str) -> str:
+    return html.escape(snippet).replace(HIGHLIGHT_START, "<b>").replace(HIGHLIGHT_STOP, "</b>")
+
+
+def search_statement(query: str, limit: int, offset: int):
+    ts_query = search_query(query)
+
+    # Ранжирование и отсечение по индексу GIN; сниппеты строятся только для страницы выдачи
+    ranked = (
+        select(
+            DocumentText.id.label("text_id"),
+            DocumentText.id_doc,
+            func.ts_rank_cd(DocumentText.search_vector, ts_query).label("rank"),
+        )
+        .where(DocumentText.search_vector.op("@@")(ts_query))
+        .order_by(func.ts_rank_cd(DocumentText.search_vector, ts_query).desc(), DocumentText.id_doc)
+        .limit(limit)
+        .offset(offset)
+        .subquery()
+    )
+
+    return (
+        select(
+            ranked.c.id_doc,
+            ranked.c.rank,
+            func.ts_headline(SEARCH_CONFIGS[0], DocumentText.text, ts_query, HEADLINE_OPTIONS).label("snippet"),
+            Document.path,
+            Document.date,
+        )
+        .join(DocumentText, DocumentText.id == ranked.c.text_id)
+        .join(Document, Document.id == ranked.c.id_doc)
+        .order_by(ranked.c.rank.desc(), ranked.c.id_doc)
+    )
+
+
+def backfill(db: Session) -> int:
+    # Заполнение индекса для текстов, распознанных до появления поиска
+    total = 0
+    while True:
+        ids = db.execute(
+            select(DocumentText.id)
+            .where(DocumentText.search_vector.is_(None))
+            .limit(BACKFILL_BATCH_SIZE)
+        ).scalars().all()
+        if not ids:
+            return total
+        db.execute(
+            update(DocumentText)
+            .where(DocumentText.id.in_(ids))
+            .values(search_vector=search_vector(DocumentText.text))
+        )
+        db.commit()
+        total += len(ids)
+
+
+if __name__ == "__main__":
+    from .database import SyncSessionLocal
+
+    with SyncSessionLocal() as session:
+        print(f"Indexed {backfill(session)} documents")
\ No newline at end of file
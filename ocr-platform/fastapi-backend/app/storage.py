@@ -0,0 +1,144 @@
+import os
+import uuid
+import hashlib
+from typing import BinaryIO, NamedTuple
+
+DOCUMENTS_DIR = os.getenv("DOCUMENTS_DIR", "documents")
+TMP_DIR = os.path.join(DOCUMENTS_DIR, ".tmp")
+# Общий с Django том с медиафайлами; пусто - регистрация по ссылке отключена
+SHARED_MEDIA_ROOT = os.getenv("SHARED_MEDIA_ROOT", "")
+FICLONE = 0x40049409
+
+# Размер блока при потоковой записи загрузок: ограничивает память на один запрос
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+
+os.makedirs(TMP_DIR, exist_ok=True)
+
+
+class StoredBlob(NamedTuple):
+    sha256: str
+    path: str
+    created: bool
+
+
+def blob_path(sha256: str, ext: str) -> str:
+    # documents/ab/cd/abcd....jpg — двухуровневое шардирование по префиксу хэша
+    return os.path.join(DOCUMENTS_DIR, sha256[:2], sha256[2:4], f"{sha256}{ext.lower()}")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobWriter:
+    """Пишет загрузку во временный файл, считая SHA-256 на лету, и по commit()
+    переносит её в контентно-адресуемое хранилище."""
+
+    def __init__(self, filename: str):
+        self.ext = os.path.splitext(os.path.basename(filename))[1]
+        self.tmp_path = os.path.join(TMP_DIR, uuid.uuid4().hex)
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._file = open(self.tmp_path, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self._digest.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self) -> StoredBlob:
+        self._file.close()
+        sha256 = self._digest.hexdigest()
+        path = blob_path(sha256, self.ext)
+
+        if os.path.exists(path):
+            os.remove(self.tmp_path)
+            return StoredBlob(sha256, path, False)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.tmp_path, path)
+        return StoredBlob(sha256, path, True)
+
+    def abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def store_stream(src: BinaryIO, filename: str) -> StoredBlob:
+    writer = BlobWriter(filename)
+    try:
+        for chunk in iter(lambda: src.read(UPLOAD_CHUNK_SIZE), b""):
+            writer.write(chunk)
+        return writer.commit()
+    except Exception:
+        writer.abort()
+        raise
+
+
+def store_bytes(data: bytes, filename: str) -> StoredBlob:
+    writer = BlobWriter(filename)
+    try:
+        writer.write(data)
+        return writer.commit()
+    except Exception:
+        writer.abort()
+        raise
+
+
+def resolve_shared_path(storage_key: str) -> str:
+    if not SHARED_MEDIA_ROOT:
+        raise ValueError("Shared media volume is not configured")
+    root = os.path.realpath(SHARED_MEDIA_ROOT)
+    path = os.path.realpath(os.path.join(root, storage_key))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise ValueError(f"Invalid storage key: {storage_key}")
+    return path
+
+
+def reflink(src: str, dst: str) -> None:
+    import fcntl
+
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def adopt_file(path: str) -> StoredBlob:
+    """Регистрирует уже лежащий на общем томе файл без копирования данных:
+    жёсткая ссылка, иначе reflink (CoW), иначе ссылка на исходный путь."""
+    sha256 = file_sha256(path)
+    target = blob_path(sha256, os.path.splitext(path)[1])
+    if os.path.exists(target):
+        return StoredBlob(sha256, target, False)
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = os.path.join(TMP_DIR, uuid.uuid4().hex)
+    for make_link in (os.link, reflink):
+        try:
+            make_link(path, tmp_path)
+            os.replace(tmp_path, target)
+            return StoredBlob(sha256, target, True)
+        except (OSError, ImportError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # Другая точка монтирования (EXDEV) без поддержки reflink: файл остаётся на месте
+    # и зависит от Django. В docker-compose blob и медиафайлы на одном томе
+    return StoredBlob(sha256, path, True)
+
+
+def is_managed(path: str) -> bool:
+    root = os.path.realpath(DOCUMENTS_DIR)
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+
+def remove_blob(path: str) -> bool:
+    # Файлы общего тома принадлежат Django и не удаляются отсюда
+    if not is_managed(path) or not os.path.exists(path):
+        return False
+    os.remove(path)
+    return True
\ No newline at end of file
@@ -1,13 +1,49 @@
 import os
-import pytesseract
-from PIL import Image
+import time
+import logging
+from datetime import datetime
+from typing import NamedTuple, Optional
+from celery import chord, group
+from celery.utils import uuid
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, task_prerun, task_postrun
 from .celery_app import celery_app
-from .models import Document, DocumentText
+from .models import Document, DocumentText, DocumentPage, OCR_QUEUED, OCR_PROCESSING, OCR_DONE, OCR_FAILED
 from .database import SyncSessionLocal
-from sqlalchemy import select
+from .events import publish_task_event, increment_progress
+from .ocr import OCR_LANG, engine_config, ocr_page, get_engine
+from .ocr_cache import get_ocr_cache, cache_key
+from .layout import pack_result, unpack_result
+from .pages import count_pages, load_page, join_pages
+from .search import search_vector_for
+from .texts import remember_etag
+from .storage import file_sha256
+from .scheduling import DEAD_LETTER_QUEUE, estimate_cost, lane_for, time_limits, task_options
+from .failures import OCR_MAX_RETRIES, is_transient, retry_delay, describe
+from .metrics import (
+    CACHE_REQUESTS, DB_COMMIT_SECONDS, IMAGE_OPEN_SECONDS, OCR_FAILURES, QUEUE_WAIT_SECONDS,
+    mark_process_dead, start_worker_metrics_server
+)
+from sqlalchemy import select, update, or_
+from sqlalchemy.exc import IntegrityError
 
-if os.getenv("TESSERACT_CMD"):
-    pytesseract.pytesseract.tesseract_cmd = os.getenv("TESSERACT_CMD")
+logger = logging.getLogger(__name__)
+
+
+@worker_init.connect
+def init_worker_metrics(**kwargs):
+    start_worker_metrics_server()
+
+
+@worker_process_init.connect
+def init_ocr_engine(**kwargs):
+    # Движок инициализируется в каждом дочернем процессе после fork, а не в родителе
+    get_engine()
+
+
+@worker_process_shutdown.connect
+def release_worker_metrics(pid=None, **kwargs):
+    mark_process_dead(pid or os.getpid())
 
 
 def get_sync_db():
@@ -18,38 +54,369 @@ def get_sync_db():
         db.close()
 
 
-@celery_app.task(name='process_ocr_task')
-def process_ocr_for_document(doc_id: int):
+def touch_document(db, doc_id: int, ocr_status: str = None) -> None:
+    # Обновление отметки времени показывает API, что задача документа жива
+    values = {"ocr_updated_at": datetime.utcnow()}
+    if ocr_status:
+        values.update(ocr_status=ocr_status, ocr_error=None)
+    db.execute(update(Document).where(Document.id == doc_id).values(**values))
+
+
+def start_document(db, doc_id: int, task_id: str = None) -> bool:
+    """Переход в processing только для задачи, за которой документ закреплён (claim_documents)."""
+    query = update(Document).where(Document.id == doc_id)
+    values = {"ocr_status": OCR_PROCESSING, "ocr_error": None, "ocr_updated_at": datetime.utcnow()}
+    if task_id:
+        # Документы, поставленные в очередь без захвата, закрепляются за первой задачей
+        query = query.where(or_(Document.ocr_task_id.is_(None), Document.ocr_task_id == task_id))
+        values["ocr_task_id"] = task_id
+    result = db.execute(query.values(**values))
+    db.commit()
+    return result.rowcount > 0
+
+
+def owns_document(doc: Document, task_id: str = None) -> bool:
+    # Страницы и сборка документа, который уже перезахвачен другой задачей, не выполняются
+    return not task_id or doc.ocr_task_id in (None, task_id)
+
+
+def fail_document(db, doc_id: int, error: str, task_id: str = None) -> bool:
+    """True, если документ перешёл в failed этим вызовом, а не был там раньше.
+
+    task_id - задача из dead letter: повтор из этой очереди должен пройти start_document.
+    """
+    db.rollback()
+    values = {"ocr_status": OCR_FAILED, "ocr_error": error, "ocr_updated_at": datetime.utcnow()}
+    if task_id:
+        values["ocr_task_id"] = task_id
+    try:
+        result = db.execute(
+            update(Document)
+            .where(Document.id == doc_id, or_(Document.ocr_status.is_(None), Document.ocr_status != OCR_FAILED))
+            .values(**values)
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning("Document %s not marked as failed: %s", doc_id, e)
+        return True
+    return result.rowcount > 0
+
+
+def dead_letter(task, doc_id: int, error: str, task_id: str = None, replay_id: str = None) -> None:
+    # В очередь кладётся весь документ: при повторе готовые страницы пропускаются
+    try:
+        celery_app.send_task(
+            'process_ocr_task', args=[doc_id], queue=DEAD_LETTER_QUEUE, task_id=replay_id,
+            headers={
+                "ocr_error": error, "ocr_failed_task": task.name, "ocr_failed_task_id": task_id or task.request.id
+            }
+        )
+    except Exception as e:
+        logger.error("Document %s not dead-lettered: %s", doc_id, e)
+
+
+def give_up(task, db, doc_id: int, error: str, task_id: str = None) -> None:
+    replay_id = uuid()
+    if fail_document(db, doc_id, error, replay_id):
+        dead_letter(task, doc_id, error, task_id, replay_id)
+
+
+def retry_document(db, doc_id: int, countdown: float, retries: int, owner_id: str = None) -> bool:
+    # Документ из пакетного сообщения повторяется отдельной задачей со своими лимитами.
+    # Захват передаётся новой задаче, только если документ ещё за сообщением owner_id
+    task_id = uuid()
+    try:
+        cost = db.execute(select(Document.cost).filter(Document.id == doc_id)).scalar()
+        claim = update(Document).where(Document.id == doc_id)
+        if owner_id:
+            claim = claim.where(or_(Document.ocr_task_id.is_(None), Document.ocr_task_id == owner_id))
+        result = db.execute(
+            claim.values(ocr_status=OCR_QUEUED, ocr_task_id=task_id, ocr_updated_at=datetime.utcnow())
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning("Document %s not requeued: %s", doc_id, e)
+        return False
+    if not result.rowcount:
+        return False
+    process_ocr_for_document.apply_async(
+        args=[doc_id], task_id=task_id, countdown=countdown, retries=retries, **task_options(cost)
+    )
+    return True
+
+
+def handle_failure(task, db, doc_id: int, exc: Exception, stage: str, task_id: str = None) -> dict:
+    """Временная ошибка - повтор с экспоненциальной задержкой, остальные - failed и dead letter."""
+    db.rollback()
+    if isinstance(exc, SoftTimeLimitExceeded) and task.request.called_directly:
+        # Лимит пакетного сообщения общий на все его документы: решает process_ocr_chunk
+        raise exc
+    OCR_FAILURES.labels(stage).inc()
+    retries = task.request.retries or 0
+    if is_transient(exc) and retries < OCR_MAX_RETRIES:
+        countdown = retry_delay(retries)
+        if not task.request.called_directly:
+            raise task.retry(exc=exc, countdown=countdown, max_retries=OCR_MAX_RETRIES)
+        retry_document(db, doc_id, countdown, retries + 1, task_id)
+        return {"status": "retrying", "doc_id": doc_id, "message": describe(exc)}
+
+    give_up(task, db, doc_id, describe(exc), task_id)
+    return {"status": "error", "doc_id": doc_id, "message": describe(exc)}
+
+
+@celery_app.task(name='process_ocr_task', bind=True)
+def process_ocr_for_document(self, doc_id: int, parent_id: str = None):
+    # В пакетном сообщении задача вызывается напрямую и своего request.id не имеет:
+    # id сообщения передаётся в аргументах
+    task_id = parent_id or self.request.id
     db = next(get_sync_db())
     try:
         doc = db.execute(select(Document).filter(Document.id == doc_id)).scalar_one_or_none()
         if not doc:
             return {"status": "error", "message": f"Document {doc_id} not found"}
 
+        # Устаревшее или повторно доставленное сообщение: документ уже выдан другой задаче
+        if not start_document(db, doc_id, task_id):
+            return {"status": "skipped", "doc_id": doc_id, "message": f"Document {doc_id} claimed by another task"}
+
         if not os.path.exists(doc.path):
-            return {"status": "error", "message": f"File not found: {doc.path}"}
+            raise FileNotFoundError(f"File not found: {doc.path}")
 
         if doc.text:
+            touch_document(db, doc_id, OCR_DONE)
+            db.commit()
             return {"status": "skipped", "message": f"Document {doc_id} already processed"}
 
-        text = perform_ocr(doc.path)
+        pages = count_pages(doc.path)
+        if pages > 1:
+            # Страницы распознаются параллельно отдельными задачами, сборка - в callback.
+            # Они остаются в очереди и с приоритетом исходного документа
+            # Лимиты времени - по стоимости одной страницы
+            cost = doc.cost if doc.cost is not None else estimate_cost(doc.path).cost
+            options = {
+                "queue": lane_for(cost),
+                "priority": (self.request.delivery_info or {}).get("priority"),
+                **time_limits(cost / pages),
+            }
+            publish_task_event(task_id, "PROGRESS", doc_id=doc_id, pages=pages, done=0)
+            header = group(
+                process_ocr_page.s(doc_id, page_no, pages, task_id).set(**options)
+                for page_no in range(pages)
+            )
+            # В пакетном сообщении итог документа - событие прогресса, а не итог сообщения
+            assemble = assemble_ocr_text.si(doc_id, pages, task_id, parent_id is not None)
+            result = chord(header)(assemble.set(**options))
+            return {"status": "processing", "doc_id": doc_id, "pages": pages, "assemble_task_id": result.id}
+
+        page_text, layout = perform_ocr(doc.path, content_hash=doc.sha256)
+        text = join_pages([page_text])
 
-        doc_text = DocumentText(id_doc=doc_id, text=text)
+        doc_text = DocumentText(id_doc=doc_id, text=text, search_vector=search_vector_for(db, text))
         doc.text = doc_text
+        doc.pages = [DocumentPage(id_doc=doc_id, page_no=0, text=page_text, layout=layout)]
+        doc.ocr_status = OCR_DONE
+        doc.ocr_error = None
+        doc.ocr_updated_at = datetime.utcnow()
         db.add(doc_text)
-        db.commit()
+        try:
+            with DB_COMMIT_SECONDS.labels("document").time():
+                db.commit()
+        except IntegrityError:
+            # Текст уже сохранила другая задача (уникальный id_doc)
+            db.rollback()
+            return {"status": "skipped", "message": f"Document {doc_id} already processed"}
+        remember_etag(doc_id, text)
 
-        return {"status": "success", "doc_id": doc_id, "text_length": len(text)}
+        return {"status": "success", "doc_id": doc_id, "pages": 1, "text_length": len(text)}
     except Exception as e:
-        db.rollback()
-        return {"status": "error", "message": str(e)}
+        return handle_failure(self, db, doc_id, e, "document", task_id)
+    finally:
+        db.close()
+
+
+@celery_app.task(name='process_ocr_chunk_task', bind=True)
+def process_ocr_chunk(self, doc_ids: list):
+    """Несколько документов в одном сообщении (как celery chunks), по очереди."""
+    results = []
+    for position, doc_id in enumerate(doc_ids):
+        # Документы сообщения своих id задач не имеют: их события идут в канал сообщения
+        publish_task_event(
+            self.request.id, "PROGRESS", doc_id=doc_id, doc_state="STARTED", docs=len(doc_ids), docs_done=position
+        )
+        try:
+            result = process_ocr_for_document(doc_id, self.request.id)
+        except SoftTimeLimitExceeded:
+            # Лимит времени сообщения исчерпан, но он рассчитан на весь пакет, а не на
+            # текущий документ. Текущий и ещё не начатые документы повторяются
+            # отдельными задачами с лимитами по своей стоимости
+            logger.warning("Chunk %s timed out on document %s, requeueing %s documents",
+                           self.request.id, doc_id, len(doc_ids) - position)
+            db = next(get_sync_db())
+            try:
+                for pending in doc_ids[position:]:
+                    requeued = retry_document(db, pending, 0, 0, self.request.id)
+                    results.append({
+                        "status": "retrying" if requeued else "skipped", "doc_id": pending,
+                        "message": "Chunk time limit exceeded"
+                    })
+            finally:
+                db.close()
+            break
+        results.append(result)
+        if result.get("status") != "processing":
+            publish_document_finished(self.request.id, doc_id, result, len(doc_ids), position + 1)
+    return results
+
+
+def publish_document_finished(task_id: str, doc_id: int, result: dict, docs: int = None, docs_done: int = None):
+    publish_task_event(
+        task_id, "PROGRESS",
+        doc_id=doc_id, doc_state="FAILURE" if result.get("status") == "error" else "SUCCESS", result=result,
+        docs=docs, docs_done=docs_done
+    )
+
+
+@celery_app.task(name='process_ocr_page_task', bind=True)
+def process_ocr_page(self, doc_id: int, page_no: int, pages: int = 1, parent_id: str = None):
+    db = next(get_sync_db())
+    try:
+        doc = db.execute(select(Document).filter(Document.id == doc_id)).scalar_one_or_none()
+        if not doc:
+            return {"status": "error", "message": f"Document {doc_id} not found"}
+
+        if not owns_document(doc, parent_id):
+            return {"status": "skipped", "doc_id": doc_id, "page": page_no}
+
+        exists = db.execute(
+            select(DocumentPage.id).filter(DocumentPage.id_doc == doc_id, DocumentPage.page_no == page_no)
+        ).first()
+        if exists:
+            return {"status": "skipped", "doc_id": doc_id, "page": page_no}
+
+        text, layout = perform_ocr(doc.path, content_hash=doc.sha256, page_no=page_no)
+
+        db.add(DocumentPage(id_doc=doc_id, page_no=page_no, text=text, layout=layout))
+        touch_document(db, doc_id)
+        try:
+            with DB_COMMIT_SECONDS.labels("page").time():
+                db.commit()
+        except IntegrityError:
+            # Страницу уже сохранила повторная доставка той же задачи
+            db.rollback()
+            return {"status": "skipped", "doc_id": doc_id, "page": page_no}
+
+        publish_task_event(
+            parent_id, "PROGRESS",
+            doc_id=doc_id, page=page_no, pages=pages, done=increment_progress(parent_id)
+        )
+        return {"status": "success", "doc_id": doc_id, "page": page_no, "text_length": len(text)}
+    except Exception as e:
+        # Неудачная страница не останавливает остальные; сборка увидит, что её нет
+        return {**handle_failure(self, db, doc_id, e, "page"), "page": page_no}
     finally:
         db.close()
 
 
-def perform_ocr(image_path: str) -> str:
+@celery_app.task(name='assemble_ocr_text_task', bind=True)
+def assemble_ocr_text(self, doc_id: int, pages: int, parent_id: str = None, in_chunk: bool = False):
+    db = next(get_sync_db())
     try:
-        img = Image.open(image_path)
-        return pytesseract.image_to_string(img, lang='rus+eng')
+        doc = db.execute(select(Document).filter(Document.id == doc_id)).scalar_one_or_none()
+        if not doc:
+            return {"status": "error", "message": f"Document {doc_id} not found"}
+
+        if doc.text or not owns_document(doc, parent_id):
+            return {"status": "skipped", "message": f"Document {doc_id} already processed"}
+
+        if len(doc.pages) != pages:
+            # Причину упавшей страницы (уже записанную) не перезаписываем
+            message = f"Document {doc_id}: {len(doc.pages)} of {pages} pages recognized"
+            give_up(self, db, doc_id, message)
+            return {"status": "error", "message": message}
+
+        text = join_pages(page.text for page in doc.pages)
+
+        doc_text = DocumentText(id_doc=doc_id, text=text, search_vector=search_vector_for(db, text))
+        doc.text = doc_text
+        doc.ocr_status = OCR_DONE
+        doc.ocr_error = None
+        doc.ocr_updated_at = datetime.utcnow()
+        db.add(doc_text)
+        try:
+            with DB_COMMIT_SECONDS.labels("assemble").time():
+                db.commit()
+        except IntegrityError:
+            db.rollback()
+            return {"status": "skipped", "message": f"Document {doc_id} already processed"}
+        remember_etag(doc_id, text)
+
+        return {"status": "success", "doc_id": doc_id, "pages": len(doc.pages), "text_length": len(text)}
     except Exception as e:
-        return f"OCR processing failed: {str(e)}"
\ No newline at end of file
+        return handle_failure(self, db, doc_id, e, "assemble")
+    finally:
+        db.close()
+
+
+@task_prerun.connect
+def observe_queue_wait(task=None, **kwargs):
+    enqueued_at = getattr(task.request, "enqueued_at", None)
+    if enqueued_at:
+        queue = (task.request.delivery_info or {}).get("routing_key") or "unknown"
+        QUEUE_WAIT_SECONDS.labels(task.name, queue).observe(max(time.time() - enqueued_at, 0))
+
+
+@task_prerun.connect(sender=process_ocr_for_document)
+def publish_task_started(task_id=None, args=None, **kwargs):
+    publish_task_event(task_id, "STARTED", doc_id=args[0] if args else None)
+
+
+@task_prerun.connect(sender=process_ocr_chunk)
+def publish_chunk_started(task_id=None, args=None, **kwargs):
+    publish_task_event(task_id, "STARTED", doc_ids=args[0] if args else None)
+
+
+@task_postrun.connect
+def publish_task_finished(sender=None, task_id=None, args=None, kwargs=None, retval=None, state=None, **extra):
+    # Итог многостраничного документа публикуется задачей сборки в канал исходной задачи
+    if sender.name == assemble_ocr_text.name:
+        call = dict(zip(("doc_id", "pages", "parent_id", "in_chunk"), args or ()), **(kwargs or {}))
+        task_id = call.get("parent_id")
+        if call.get("in_chunk") and isinstance(retval, dict):
+            publish_document_finished(task_id, call["doc_id"], retval)
+            return
+    elif sender.name not in (process_ocr_for_document.name, process_ocr_chunk.name):
+        return
+
+    if isinstance(retval, dict) and retval.get("status") == "processing":
+        return
+    if state == "SUCCESS":
+        publish_task_event(task_id, state, result=retval)
+    else:
+        publish_task_event(task_id, state, error=str(retval))
+
+
+class PageResult(NamedTuple):
+    text: str
+    # Упакованные слова с рамками (layout.pack)
+    layout: Optional[bytes]
+
+
+def perform_ocr(image_path: str, content_hash: str = None, page_no: int = 0) -> PageResult:
+    # Ошибка распознавания пробрасывается: задача решает, повторять ли её,
+    # и учитывает её в OCR_FAILURES (handle_failure)
+    cache = get_ocr_cache()
+    content_hash = content_hash or file_sha256(image_path)
+    key = cache_key(f"{content_hash}:{page_no}", OCR_LANG, engine_config())
+
+    value = cache.get(key)
+    CACHE_REQUESTS.labels("miss" if value is None else "hit").inc()
+    if value is not None:
+        return PageResult(*unpack_result(value))
+
+    with IMAGE_OPEN_SECONDS.time():
+        img = load_page(image_path, page_no)
+    result = PageResult(*ocr_page(img))
+    cache.set(key, pack_result(*result))
+    return result
\ No newline at end of file
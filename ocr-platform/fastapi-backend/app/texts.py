@@ -0,0 +1,107 @@
+import os
+import json
+import zlib
+import hashlib
+import logging
+from typing import Optional
+
+import redis
+
+from .events import get_client, get_async_client
+
+logger = logging.getLogger(__name__)
+
+# ETag текста документа хранится в Redis: повторный запрос с If-None-Match
+# получает 304 без обращения к PostgreSQL
+TEXT_ETAG_PREFIX = "ocr:etag:"
+TEXT_ETAG_TTL = int(os.getenv("TEXT_ETAG_TTL", 7 * 24 * 3600))
+TEXT_CHUNK_SIZE = int(os.getenv("TEXT_CHUNK_SIZE", 64 * 1024))
+# Короткие ответы не сжимаются: заголовок gzip дороже выигрыша
+TEXT_GZIP_MIN_SIZE = int(os.getenv("TEXT_GZIP_MIN_SIZE", 1024))
+TEXT_GZIP_LEVEL = int(os.getenv("TEXT_GZIP_LEVEL", 6))
+
+
+def text_etag(text: str) -> str:
+    # Слабый тег: gzip и несжатый ответ - разные байты одного содержимого,
+    # а сильный ETag обязан различать представления (RFC 9110, 8.8.1)
+    return 'W/"' + hashlib.sha1(text.encode("utf-8")).hexdigest() + '"'
+
+
+def weak_etag(etag: str) -> str:
+    # В Redis могут оставаться сильные теги, записанные до перехода на слабые
+    return etag if etag.startswith("W/") else "W/" + etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    # If-None-Match сравнивает теги слабо: префикс W/ не учитывается
+    if not if_none_match or not etag:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags or "*" in tags
+
+
+def remember_etag(doc_id: int, text: str) -> str:
+    """Вызывается воркером после сохранения текста."""
+    etag = text_etag(text)
+    if os.getenv("REDIS_URL"):
+        try:
+            get_client().set(f"{TEXT_ETAG_PREFIX}{doc_id}", etag, ex=TEXT_ETAG_TTL)
+        except redis.RedisError as e:
+            logger.warning("ETag for document %s not stored: %s", doc_id, e)
+    return etag
+
+
+async def cached_etag(doc_id: int) -> Optional[str]:
+    if not os.getenv("REDIS_URL"):
+        return None
+    try:
+        value = await get_async_client().get(f"{TEXT_ETAG_PREFIX}{doc_id}")
+    except redis.RedisError as e:
+        logger.warning("ETag cache unavailable: %s", e)
+        return None
+    return weak_etag(value.decode()) if value else None
+
+
+async def store_etag(doc_id: int, etag: str) -> None:
+    if not os.getenv("REDIS_URL"):
+        return
+    try:
+        await get_async_client().set(f"{TEXT_ETAG_PREFIX}{doc_id}", etag, ex=TEXT_ETAG_TTL)
+    except redis.RedisError as e:
+        logger.warning("ETag for document %s not stored: %s", doc_id, e)
+
+
+async def forget_etag(doc_id: int) -> None:
+    if not os.getenv("REDIS_URL"):
+        return
+    try:
+        await get_async_client().delete(f"{TEXT_ETAG_PREFIX}{doc_id}")
+    except redis.RedisError as e:
+        logger.warning("ETag for document %s not removed: %s", doc_id, e)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def iter_text_json(fields: dict, text: str):
+    """JSON-объект с полем text, выдаваемый частями без копии всего ответа в памяти."""
+    head = json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+    yield (head[:-1] + ',"text":"').encode("utf-8")
+    for start in range(0, len(text), TEXT_CHUNK_SIZE):
+        # Отдельная строка JSON без кавычек - корректный фрагмент общей строки
+        yield json.dumps(text[start:start + TEXT_CHUNK_SIZE], ensure_ascii=False)[1:-1].encode("utf-8")
+    yield b'"}'
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(TEXT_GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
\ No newline at end of file
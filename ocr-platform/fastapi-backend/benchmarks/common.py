@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import math
+import hashlib
+
+# Отдельный неизменяемый каталог: documents/ - живое хранилище загрузок, и корпус
+# из него менялся бы от прогона к прогону
+DEFAULT_CORPUS = os.getenv("OCR_BENCH_CORPUS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus"))
+CORPUS_EXTENSIONS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".pdf"}
+
+
+def load_corpus(path: str = DEFAULT_CORPUS, limit: int = None) -> list:
+    # Фиксированный корпус: уникальные по содержимому файлы в стабильном порядке
+    seen = set()
+    corpus = []
+    for root, _, files in sorted(os.walk(path)):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() not in CORPUS_EXTENSIONS:
+                continue
+            file_path = os.path.join(root, name)
+            with open(file_path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            corpus.append(file_path)
+    return corpus[:limit] if limit else corpus
+
+
+def corpus_hash(corpus: list) -> str:
+    """Хэш содержимого корпуса в отчёте: отчёты сравнимы, только если он совпадает."""
+    digest = hashlib.sha256()
+    for path in corpus:
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(seconds: list) -> dict:
+    return {
+        "count": len(seconds),
+        "mean_ms": round(1000 * sum(seconds) / len(seconds), 2) if seconds else 0.0,
+        "p50_ms": round(1000 * percentile(seconds, 0.50), 2),
+        "p95_ms": round(1000 * percentile(seconds, 0.95), 2),
+    }
+
+
+def emit(report: dict, output: str = None) -> None:
+    data = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w") as f:
+            f.write(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
\ No newline at end of file
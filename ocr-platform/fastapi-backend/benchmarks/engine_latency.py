@@ -0,0 +1,72 @@
+"""Задержка распознавания страницы для разных движков OCR.
+
+    python -m benchmarks.engine_latency --engines pytesseract,tesserocr --repeat 5
+
+Изображения загружаются и предобрабатываются заранее, поэтому сравнивается
+только сам вызов движка: процесс tesseract на каждую страницу против
+постоянного экземпляра TessBaseAPI. Отдельно показана первая (холодная)
+страница, на которую у tesserocr приходится загрузка traineddata.
+"""
+import os
+import time
+import argparse
+
+from .common import DEFAULT_CORPUS, load_corpus, corpus_hash, latency_summary, emit
+
+
+def run(engine_name: str, pages: list, repeat: int) -> dict:
+    from app.ocr import ENGINES
+
+    started = time.perf_counter()
+    engine = ENGINES[engine_name]()
+    engine.image_to_data(pages[0])
+    cold = time.perf_counter() - started
+
+    timings = []
+    for _ in range(repeat):
+        for img in pages:
+            started = time.perf_counter()
+            engine.image_to_data(img)
+            timings.append(time.perf_counter() - started)
+
+    return {
+        "engine": engine_name,
+        "cold_start_ms": round(1000 * cold, 2),
+        "page_latency": latency_summary(timings),
+    }
+
+
+def main():
+    from app.pages import count_pages, load_page
+    from app.preprocess import preprocess
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--engines", default="pytesseract,tesserocr")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    pages = [
+        preprocess(load_page(path, page_no))
+        for path in corpus
+        for page_no in range(count_pages(path))
+    ]
+
+    results = [run(name, pages, args.repeat) for name in args.engines.split(",")]
+    baseline = results[0]["page_latency"]["p50_ms"]
+    for result in results:
+        result["p50_speedup"] = round(baseline / result["page_latency"]["p50_ms"], 2)
+
+    emit({
+        "benchmark": "engine_latency",
+        "pages": len(pages),
+        "corpus": [os.path.relpath(path, args.corpus) for path in corpus],
+        "corpus_sha256": corpus_hash(corpus),
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
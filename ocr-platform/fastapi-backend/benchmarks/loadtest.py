@@ -0,0 +1,273 @@
+"""Нагрузочный тест API загрузки, постановки в очередь и опроса статуса.
+
+    python -m benchmarks.loadtest --clients 1,8,32 --requests 2000 \\
+        --mix upload=1,analyse=2,status=6,text=3
+
+Приложение запускается в том же процессе через httpx.ASGITransport: сеть и
+внешние сервисы не нужны. По умолчанию БД - временный SQLite (--database-url
+позволяет указать PostgreSQL), брокер Celery - memory://, результаты задач -
+cache+memory://, счётчики приоритетов - fakeredis (если установлен), поэтому
+analyse измеряет только постановку в очередь, а status - чтение состояния.
+Виртуальные клиенты выполняют запросы в указанной пропорции.
+
+Для каждого эндпоинта считаются пропускная способность, задержки p50/p95/p99 и
+время, на которое обработчики блокировали event loop: длительность каждого шага
+задачи, выполненного в цикле, относится к эндпоинту этой задачи (включая
+небольшую долю работы самого httpx-клиента в той же задаче).
+"""
+import os
+import time
+import base64
+import random
+import asyncio
+import argparse
+import tempfile
+from collections import defaultdict
+
+from .common import DEFAULT_CORPUS, load_corpus, corpus_hash, latency_summary, percentile, emit
+
+SEED_TEXT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 40
+LAG_PROBE_INTERVAL = 0.01
+
+
+class LoopBlockMonitor:
+    """Замеряет каждый callback event loop и относит его время к имени задачи."""
+
+    def __init__(self):
+        self.blocked = defaultdict(list)
+        self.lag = []
+        self._original = None
+
+    def install(self) -> None:
+        from asyncio import events
+
+        self._original = original = events.Handle._run
+        blocked = self.blocked
+
+        def _run(handle):
+            started = time.perf_counter()
+            try:
+                original(handle)
+            finally:
+                owner = getattr(handle._callback, "__self__", None)
+                name = owner.get_name() if isinstance(owner, asyncio.Task) else "loop"
+                blocked[name].append(time.perf_counter() - started)
+
+        events.Handle._run = _run
+
+    def uninstall(self) -> None:
+        from asyncio import events
+
+        events.Handle._run = self._original
+
+    async def probe(self) -> None:
+        # Классический замер: насколько позже запланированного просыпается sleep
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            self.lag.append(max(time.perf_counter() - started - LAG_PROBE_INTERVAL, 0))
+
+
+def configure(database_url: str, tmp: str) -> None:
+    # Настройки приложения читаются при импорте app.*
+    os.environ["DOCUMENTS_DIR"] = os.path.join(tmp, "documents")
+    os.environ["OCR_CACHE_BACKEND"] = "memory"
+    os.environ.pop("REDIS_URL", None)
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+        os.environ["SYNC_DATABASE_URL"] = database_url.replace("+asyncpg", "").replace("+aiosqlite", "")
+    else:
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/loadtest.db"
+        os.environ["SYNC_DATABASE_URL"] = f"sqlite:///{tmp}/loadtest.db"
+
+    from app import events
+    from app.celery_app import celery_app
+    celery_app.conf.update(broker_url="memory://", result_backend="cache+memory://")
+    # Счётчики справедливой очереди (scheduling.claim_priority) - в fakeredis
+    try:
+        import fakeredis
+        events._client = fakeredis.FakeRedis()
+    except ImportError:
+        pass
+
+
+async def seed(documents: int) -> list:
+    from datetime import date
+    from app.database import async_engine, AsyncSessionLocal, Base
+    from app.models import Document, DocumentText
+
+    # Существующие таблицы и данные (--database-url) не трогаются, только дополняются
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        docs = [Document(path=f"seed/{i}.png", date=date.today()) for i in range(documents)]
+        db.add_all(docs)
+        await db.flush()
+        db.add_all(DocumentText(id_doc=doc.id, text=SEED_TEXT) for doc in docs)
+        await db.commit()
+        return [doc.id for doc in docs]
+
+
+class Workload:
+    def __init__(self, client, corpus: list, doc_ids: list, rng: random.Random):
+        self.client = client
+        self.rng = rng
+        self.payloads = []
+        for path in corpus:
+            with open(path, "rb") as f:
+                self.payloads.append((os.path.basename(path), f.read()))
+        self.text_ids = list(doc_ids)
+        self.doc_ids = list(doc_ids)
+        self.task_ids = []
+
+    async def upload(self):
+        name, data = self.rng.choice(self.payloads)
+        # Уникальный хвост, иначе все загрузки после первой - дубликаты
+        data = data + os.urandom(16)
+        response = await self.client.post("/upload_doc", data={
+            "file_content": base64.b64encode(data).decode(),
+            "filename": name,
+            "doc_date": "2024-01-01",
+        })
+        if response.status_code in (200, 201):
+            self.doc_ids.append(response.json()["document_id"])
+        return response
+
+    async def analyse(self):
+        response = await self.client.post(f"/doc_analyse/{self.rng.choice(self.doc_ids)}")
+        if response.status_code == 202:
+            self.task_ids.append(response.json()["task_id"])
+        return response
+
+    async def status(self):
+        if not self.task_ids:
+            return await self.analyse()
+        return await self.client.get(f"/task_status/{self.rng.choice(self.task_ids)}")
+
+    async def text(self):
+        return await self.client.get(f"/get_text/{self.rng.choice(self.text_ids)}")
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ("upload", "analyse", "status", "text"):
+            raise ValueError(f"Unknown operation: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run(app, workload_args: tuple, clients: int, requests: int, mix: dict, seed_value: int) -> dict:
+    import httpx
+
+    rng = random.Random(seed_value)
+    names, weights = list(mix), list(mix.values())
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    remaining = requests
+    monitor = LoopBlockMonitor()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest") as client:
+        workload = Workload(client, *workload_args, rng)
+
+        async def request(name: str):
+            started = time.perf_counter()
+            response = await getattr(workload, name)()
+            samples[name].append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[name] += 1
+
+        async def virtual_client():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                name = rng.choices(names, weights)[0]
+                # Задача с именем операции - по нему монитор относит блокировки
+                await asyncio.create_task(request(name), name=name)
+
+        monitor.install()
+        probe = asyncio.create_task(monitor.probe(), name="probe")
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(virtual_client() for _ in range(clients)))
+        finally:
+            elapsed = time.perf_counter() - started
+            probe.cancel()
+            monitor.uninstall()
+
+    endpoints = {}
+    for name in names:
+        timings = samples[name]
+        blocked = monitor.blocked.get(name, [])
+        endpoints[name] = {
+            "requests": len(timings),
+            "errors": errors[name],
+            "rps": round(len(timings) / elapsed, 2),
+            "latency": {**latency_summary(timings), "p99_ms": round(1000 * percentile(timings, 0.99), 2)},
+            "loop_blocked": {
+                "total_ms": round(1000 * sum(blocked), 2),
+                "per_request_ms": round(1000 * sum(blocked) / len(timings), 3) if timings else 0.0,
+                "max_step_ms": round(1000 * max(blocked), 2) if blocked else 0.0,
+            },
+        }
+
+    return {
+        "clients": clients,
+        "requests": sum(len(t) for t in samples.values()),
+        "seconds": round(elapsed, 3),
+        "rps": round(sum(len(t) for t in samples.values()) / elapsed, 2),
+        "loop_lag": {
+            "p50_ms": round(1000 * percentile(monitor.lag, 0.50), 2),
+            "p99_ms": round(1000 * percentile(monitor.lag, 0.99), 2),
+            "max_ms": round(1000 * max(monitor.lag, default=0), 2),
+        },
+        "endpoints": endpoints,
+    }
+
+
+async def main_async(args) -> dict:
+    from app.main import app
+
+    mix = parse_mix(args.mix)
+    corpus = load_corpus(args.corpus, args.limit)
+    runs = []
+    for clients in (int(n) for n in args.clients.split(",")):
+        doc_ids = await seed(args.seed_documents)
+        runs.append(await run(app, (corpus, doc_ids), clients, args.requests, mix, args.seed))
+
+    # Насыщение - число клиентов, после которого rps перестаёт расти
+    best = max(runs, key=lambda r: r["rps"])
+    return {
+        "benchmark": "loadtest",
+        "mix": mix,
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        "corpus": [os.path.relpath(path, args.corpus) for path in corpus],
+        "corpus_sha256": corpus_hash(corpus),
+        "saturation_clients": best["clients"],
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--clients", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--mix", default="upload=1,analyse=2,status=6,text=3")
+    parser.add_argument("--seed-documents", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(args.database_url, tmp)
+        report = asyncio.run(main_async(args))
+    emit(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
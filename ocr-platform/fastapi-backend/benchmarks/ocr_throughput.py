@@ -0,0 +1,76 @@
+"""Пропускная способность OCR в зависимости от числа процессов.
+
+    python -m benchmarks.ocr_throughput --workers 1,2,4 --repeat 3
+
+Каждый процесс распознаёт страницы корпуса так же, как воркер Celery в режиме
+prefork (OMP_THREAD_LIMIT=1). Результат - JSON со страницами в секунду и
+ускорением относительно одного процесса.
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from .common import DEFAULT_CORPUS, load_corpus, corpus_hash, latency_summary, emit
+
+
+def _init_worker():
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_document(path: str):
+    from app.ocr import ocr_page
+    from app.pages import count_pages, load_page
+
+    timings = []
+    for page_no in range(count_pages(path)):
+        started = time.perf_counter()
+        ocr_page(load_page(path, page_no))
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run(corpus: list, workers: int, repeat: int) -> dict:
+    jobs = corpus * repeat
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        # Прогрев: загрузка traineddata и импорт модулей в каждом процессе
+        list(pool.map(_ocr_document, corpus[:1] * workers))
+
+        started = time.perf_counter()
+        timings = [t for result in pool.map(_ocr_document, jobs) for t in result]
+        elapsed = time.perf_counter() - started
+
+    return {
+        "workers": workers,
+        "pages": len(timings),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(len(timings) / elapsed, 3),
+        "page_latency": latency_summary(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, 2, os.cpu_count() or 1})))
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    runs = [run(corpus, int(n), args.repeat) for n in args.workers.split(",")]
+    baseline = runs[0]["pages_per_sec"]
+    for result in runs:
+        result["speedup"] = round(result["pages_per_sec"] / baseline, 2)
+
+    emit({
+        "benchmark": "ocr_throughput",
+        "cpu_count": os.cpu_count(),
+        "corpus": [os.path.relpath(path, args.corpus) for path in corpus],
+        "corpus_sha256": corpus_hash(corpus),
+        "runs": runs,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""Выигрыш по времени и изменение точности OCR от предобработки изображений.
+
+    python -m benchmarks.preprocessing --pipelines "resize;resize,grayscale;resize,grayscale,binarize,deskew"
+
+Для каждой страницы корпуса OCR выполняется без предобработки и с каждым из
+наборов шагов. Точность - посимвольное сходство (difflib) с эталоном
+<имя файла>.txt из --truth; без эталона сравнение идёт с результатом OCR без
+предобработки, т.е. измеряется согласие, а не точность.
+"""
+import os
+import time
+import argparse
+from difflib import SequenceMatcher
+
+from .common import DEFAULT_CORPUS, load_corpus, corpus_hash, latency_summary, emit
+
+
+def similarity(text: str, reference: str) -> float:
+    return SequenceMatcher(None, " ".join(text.split()), " ".join(reference.split()), autojunk=False).ratio()
+
+
+def load_truth(truth_dir: str, path: str):
+    if not truth_dir:
+        return None
+    truth_path = os.path.join(truth_dir, os.path.splitext(os.path.basename(path))[0] + ".txt")
+    if not os.path.exists(truth_path):
+        return None
+    with open(truth_path, encoding="utf-8") as f:
+        return f.read()
+
+
+def run_pipeline(pages: list, steps: tuple) -> tuple:
+    from app.ocr import ocr_page
+
+    texts, timings = [], []
+    for img in pages:
+        started = time.perf_counter()
+        text, _ = ocr_page(img, steps)
+        texts.append(text)
+        timings.append(time.perf_counter() - started)
+    return texts, timings
+
+
+def main():
+    from app.pages import count_pages, load_page
+    from app.preprocess import parse_steps
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--truth", help="каталог с эталонными текстами <имя>.txt")
+    parser.add_argument("--pipelines", default="resize;resize,grayscale;resize,grayscale,binarize,deskew")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    pages, truths = [], []
+    for path in corpus:
+        truth = load_truth(args.truth, path)
+        for page_no in range(count_pages(path)):
+            img = load_page(path, page_no)
+            img.load()
+            pages.append(img)
+            truths.append(truth)
+
+    raw_texts, raw_timings = run_pipeline(pages, ())
+    references = [truth if truth is not None else raw for truth, raw in zip(truths, raw_texts)]
+
+    def score(texts):
+        return round(sum(similarity(t, r) for t, r in zip(texts, references)) / len(texts), 4)
+
+    raw_seconds = sum(raw_timings)
+    raw_accuracy = score(raw_texts)
+    results = [{
+        "pipeline": "none",
+        "seconds": round(raw_seconds, 3),
+        "latency": latency_summary(raw_timings),
+        "accuracy": raw_accuracy,
+    }]
+    for spec in args.pipelines.split(";"):
+        steps = parse_steps(spec)
+        texts, timings = run_pipeline(pages, steps)
+        seconds = sum(timings)
+        accuracy = score(texts)
+        results.append({
+            "pipeline": ",".join(steps),
+            "seconds": round(seconds, 3),
+            "latency": latency_summary(timings),
+            "time_saved_pct": round(100 * (raw_seconds - seconds) / raw_seconds, 1),
+            "accuracy": accuracy,
+            "accuracy_delta": round(accuracy - raw_accuracy, 4),
+        })
+
+    emit({
+        "benchmark": "preprocessing",
+        "reference": "ground_truth" if any(t is not None for t in truths) else "raw_ocr",
+        "pages": len(pages),
+        "corpus": [os.path.relpath(path, args.corpus) for path in corpus],
+        "corpus_sha256": corpus_hash(corpus),
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""Регрессионный бенчмарк горячего пути OCR по матрице конфигураций.
+
+    python -m benchmarks.suite --engines pytesseract,tesserocr \\
+        --preprocess "resize,grayscale;resize,grayscale,deskew" --workers 1,4 \\
+        --output current.json --baseline previous.json
+
+Для каждой комбинации движка, набора предобработки и числа процессов измеряются
+две стадии на фиксированном корпусе (benchmarks/corpus или --corpus):
+
+* perform_ocr - распознавание отдельных страниц;
+* document - полный путь process_ocr_for_document: подсчёт страниц, OCR,
+  сохранение страниц и текста в БД.
+
+Внешние сервисы заменены локальными: SQLite вместо PostgreSQL, Celery в режиме
+eager, fakeredis (если установлен) для событий задач. Кэш OCR отключён, чтобы
+каждый прогон действительно распознавал. Каждая конфигурация запускается в
+новых процессах (spawn), так как настройки OCR читаются при импорте.
+
+С --baseline результат сравнивается с прошлым отчётом: падение pages/sec или
+рост p95 больше --tolerance даёт код возврата 1, отчёт по другому корпусу
+(corpus_sha256) - код 2.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import itertools
+import multiprocessing
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+
+from .common import DEFAULT_CORPUS, load_corpus, corpus_hash, latency_summary, emit
+
+
+def _init_worker(engine: str, steps: str, db_path: str):
+    os.environ.update({
+        "OMP_THREAD_LIMIT": "1",
+        "OCR_ENGINE": engine,
+        "OCR_PREPROCESS": "" if steps == "none" else steps,
+        "OCR_CACHE_BACKEND": "memory",
+        "OCR_CACHE_MAX_ENTRIES": "0",
+        "DATABASE_URL": f"sqlite+aiosqlite:///{db_path}",
+        "SYNC_DATABASE_URL": f"sqlite:///{db_path}",
+    })
+    from app import events
+    from app.celery_app import celery_app
+
+    celery_app.conf.update(broker_url="memory://", result_backend="cache+memory://", task_always_eager=True)
+    try:
+        import fakeredis
+        events._client = fakeredis.FakeRedis()
+    except ImportError:
+        pass
+
+
+def _create_schema():
+    from app.database import Base, sync_engine
+    from app import models  # noqa: F401 - регистрирует таблицы в Base.metadata
+
+    Base.metadata.create_all(sync_engine)
+
+
+def _peak_rss_kb() -> tuple:
+    # ru_maxrss в килобайтах (Linux); у детей - самый большой из процессов tesseract/pdftoppm
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+def _perform_ocr(job: tuple):
+    from app.tasks import perform_ocr
+
+    path, page_no = job
+    started = time.perf_counter()
+    try:
+        perform_ocr(path, page_no=page_no)
+        failed = False
+    except Exception:
+        failed = True
+    elapsed = time.perf_counter() - started
+    return elapsed, 1, failed, _peak_rss_kb()
+
+
+def _process_document(path: str):
+    from app.database import SyncSessionLocal
+    from app.models import Document
+    from app.pages import count_pages
+    from app.tasks import process_ocr_for_document
+
+    pages = count_pages(path)
+    with SyncSessionLocal() as db:
+        doc = Document(path=path, date=date.today())
+        db.add(doc)
+        db.commit()
+        doc_id = doc.id
+
+    started = time.perf_counter()
+    result = process_ocr_for_document.apply(args=[doc_id]).get()
+    elapsed = time.perf_counter() - started
+    return elapsed, pages, result.get("status") == "error", _peak_rss_kb()
+
+
+def summarize(results: list, elapsed: float, latency_key: str) -> dict:
+    pages = sum(r[1] for r in results)
+    return {
+        "jobs": len(results),
+        "pages": pages,
+        "errors": sum(1 for r in results if r[2]),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 3) if elapsed else 0.0,
+        latency_key: latency_summary([r[0] for r in results]),
+    }
+
+
+def run_stage(pool, func, jobs: list, latency_key: str) -> tuple:
+    started = time.perf_counter()
+    results = list(pool.map(func, jobs))
+    elapsed = time.perf_counter() - started
+    return summarize(results, elapsed, latency_key), results
+
+
+def run(corpus: list, engine: str, steps: str, workers: int, repeat: int, stages: list) -> dict:
+    from app.pages import count_pages
+
+    page_jobs = [(path, page_no) for path in corpus for page_no in range(count_pages(path))]
+    context = multiprocessing.get_context("spawn")
+    report = {"engine": engine, "preprocess": steps, "workers": workers, "stages": {}}
+    all_results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        initargs = (engine, steps, os.path.join(tmp, "bench.db"))
+        with ProcessPoolExecutor(1, mp_context=context, initializer=_init_worker, initargs=initargs) as pool:
+            pool.submit(_create_schema).result()
+
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=initargs) as pool:
+            # Прогрев: импорт модулей и инициализация движка в каждом процессе
+            list(pool.map(_perform_ocr, page_jobs[:1] * workers))
+
+            if "perform_ocr" in stages:
+                summary, results = run_stage(pool, _perform_ocr, page_jobs * repeat, "page_latency")
+                report["stages"]["perform_ocr"] = summary
+                all_results += results
+            if "document" in stages:
+                summary, results = run_stage(pool, _process_document, corpus * repeat, "document_latency")
+                report["stages"]["document"] = summary
+                all_results += results
+
+    report["peak_rss_mb"] = {
+        "worker": round(max(r[3][0] for r in all_results) / 1024, 1),
+        "subprocesses": round(max(r[3][1] for r in all_results) / 1024, 1),
+    }
+    return report
+
+
+def regressions(current: dict, baseline: dict, tolerance: float) -> list:
+    # Сравниваются одинаковые конфигурации и стадии двух отчётов
+    key = lambda r: (r["engine"], r["preprocess"], r["workers"])
+    previous = {key(r): r for r in baseline.get("runs", [])}
+    found = []
+    for run_report in current["runs"]:
+        before = previous.get(key(run_report))
+        if not before:
+            continue
+        for stage, now in run_report["stages"].items():
+            was = before["stages"].get(stage)
+            if not was:
+                continue
+            latency = "page_latency" if "page_latency" in now else "document_latency"
+            if now["pages_per_sec"] < was["pages_per_sec"] * (1 - tolerance):
+                found.append(f"{key(run_report)} {stage}: pages/sec {was['pages_per_sec']} -> {now['pages_per_sec']}")
+            if now[latency]["p95_ms"] > was[latency]["p95_ms"] * (1 + tolerance):
+                found.append(f"{key(run_report)} {stage}: p95 {was[latency]['p95_ms']} -> {now[latency]['p95_ms']} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--engines", default="pytesseract")
+    # Наборы шагов предобработки разделяются ";", шаги внутри набора - ","
+    parser.add_argument("--preprocess", default="resize,grayscale;none")
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, os.cpu_count() or 1})))
+    parser.add_argument("--stages", default="perform_ocr,document")
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.limit)
+    stages = args.stages.split(",")
+    runs = [
+        run(corpus, engine, steps, int(workers), args.repeat, stages)
+        for engine, steps, workers in itertools.product(
+            args.engines.split(","), args.preprocess.split(";"), args.workers.split(",")
+        )
+    ]
+
+    report = {
+        "benchmark": "suite",
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "corpus": [os.path.relpath(path, args.corpus) for path in corpus],
+        "corpus_sha256": corpus_hash(corpus),
+        "runs": runs,
+    }
+    emit(report, args.output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("corpus_sha256") != report["corpus_sha256"]:
+            sys.stderr.write("Baseline was measured on a different corpus\n")
+            sys.exit(2)
+        found = regressions(report, baseline, args.tolerance)
+        for line in found:
+            sys.stderr.write(f"REGRESSION {line}\n")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+import pytest
+
+# Тесты работают с SQLite во временном каталоге и без Redis: переменные задаются
+# до импорта app, так как движки БД и каталог blob создаются при импорте
+_work = tempfile.mkdtemp(prefix="ocr-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_work}/test.db"
+os.environ["SYNC_DATABASE_URL"] = f"sqlite:///{_work}/test.db"
+os.environ["DOCUMENTS_DIR"] = os.path.join(_work, "documents")
+os.environ["OCR_CACHE_BACKEND"] = "memory"
+os.environ.pop("REDIS_URL", None)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    from app.database import Base, AsyncSessionLocal, async_engine
+    from app import models  # noqa: F401 - регистрирует таблицы в Base.metadata
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as session:
+        yield session
+    # Соединения aiosqlite привязаны к циклу событий теста
+    await async_engine.dispose()
\ No newline at end of file
@@ -0,0 +1,94 @@
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from celery.result import GroupResult
+
+from app import main
+from app.celery_app import celery_app
+
+pytestmark = pytest.mark.anyio
+
+
+class ResultBackend:
+    """Результаты задач по ключам, как в Redis; считает обращения MGET."""
+
+    def __init__(self, results):
+        self.results = results
+        self.mget_calls = []
+
+    def get_key_for_task(self, task_id):
+        return f"celery-task-meta-{task_id}".encode()
+
+    def mget(self, keys):
+        self.mget_calls.append(len(keys))
+        return [
+            json.dumps(self.results[key.decode()[len("celery-task-meta-"):]])
+            if key.decode()[len("celery-task-meta-"):] in self.results else None
+            for key in keys
+        ]
+
+    def decode_result(self, value):
+        return json.loads(value)
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    def use(task_ids, results):
+        backend = ResultBackend(results)
+        monkeypatch.setattr(type(celery_app), "backend", property(lambda app: backend))
+        restored = SimpleNamespace(results=[SimpleNamespace(id=task_id) for task_id in task_ids])
+        monkeypatch.setattr(GroupResult, "restore", lambda batch_id, app=None: restored if batch_id == "b1" else None)
+        return backend
+    return use
+
+
+def success(result):
+    return {"status": "SUCCESS", "result": result}
+
+
+def dispatched(doc_id, assemble_id):
+    return {"status": "processing", "doc_id": doc_id, "pages": 3, "assemble_task_id": assemble_id}
+
+
+async def batch_status(batch_id="b1"):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(f"/batch_status/{batch_id}")
+
+
+async def test_status_is_read_with_one_mget_per_level(batch):
+    backend = batch(["t1", "t2", "t3", "chunk"], {
+        "t1": success({"status": "success", "doc_id": 1}),
+        "t2": {"status": "FAILURE", "result": "boom"},
+        "chunk": success([dispatched(4, "a4"), {"status": "error", "doc_id": 5}]),
+        "a4": success({"status": "success", "doc_id": 4}),
+    })
+
+    response = (await batch_status()).json()
+    assert backend.mget_calls == [4, 1]
+    assert response == {
+        "batch_id": "b1",
+        "total": 4,
+        "completed": 3,
+        "progress": 0.75,
+        "states": {"SUCCESS": 2, "FAILURE": 1, "PENDING": 1},
+        "errors": 1,
+    }
+
+
+async def test_document_is_in_progress_until_its_assembly_finishes(batch):
+    backend = batch(["t1"], {"t1": success(dispatched(1, "a1")), "a1": {"status": "STARTED"}})
+
+    response = (await batch_status()).json()
+    assert response["states"] == {"PROGRESS": 1} and response["completed"] == 0
+
+    backend.results["a1"] = {"status": "FAILURE", "result": "boom"}
+    response = (await batch_status()).json()
+    assert response["states"] == {"SUCCESS": 1} and response["errors"] == 1
+
+
+async def test_unknown_batch(batch):
+    batch([], {})
+    assert (await batch_status("missing")).status_code == 404
\ No newline at end of file
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app import events, main, tasks
+from app.events import TaskEventHub, format_sse, task_channel
+
+pytestmark = pytest.mark.anyio
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = messages
+        self.closed = False
+
+    async def psubscribe(self, pattern):
+        self.pattern = pattern
+
+    async def listen(self):
+        for task_id, payload in self.messages:
+            yield {"type": "pmessage", "channel": task_channel(task_id).encode(), "data": json.dumps(payload)}
+        await asyncio.Event().wait()
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pubsub(monkeypatch):
+    fake = FakePubSub([])
+
+    class Client:
+        def pubsub(self):
+            return fake
+
+    monkeypatch.setattr(events, "get_async_client", Client)
+    return fake
+
+
+@pytest.fixture
+def published(monkeypatch):
+    sent = []
+    monkeypatch.setattr(tasks, "publish_task_event", lambda task_id, state, **data: sent.append((task_id, state, data)))
+    return sent
+
+
+def event(task_id, state, **data):
+    return {"task_id": task_id, "state": state, "final": state in events.FINAL_STATES, **data}
+
+
+def test_sse_frame_names_the_state():
+    frame = format_sse(event("t", "PROGRESS", done=1))
+    assert frame.startswith("event: progress\ndata: ") and frame.endswith("\n\n")
+    assert json.loads(frame.split("data: ", 1)[1]) == event("t", "PROGRESS", done=1)
+
+
+async def test_hub_routes_events_to_subscribers_of_the_task(pubsub):
+    pubsub.messages = [("other", event("other", "STARTED")), ("t1", event("t1", "SUCCESS"))]
+    hub = TaskEventHub()
+    queue = await hub.subscribe("t1")
+
+    assert await asyncio.wait_for(queue.get(), 1) == event("t1", "SUCCESS")
+    assert queue.empty()
+
+    hub.unsubscribe("t1", queue)
+    await hub.close()
+    assert pubsub.closed and hub._reader is None
+
+
+async def test_app_shutdown_closes_the_hub(pubsub):
+    async with main.app.router.lifespan_context(main.app):
+        await main.task_event_hub.subscribe("t1")
+    assert pubsub.closed and main.task_event_hub._reader is None
+
+
+async def test_stream_ends_with_the_final_event(pubsub, monkeypatch):
+    pubsub.messages = [("t1", event("t1", "PROGRESS", done=2)), ("t1", event("t1", "SUCCESS", result={}))]
+    monkeypatch.setattr(main, "current_task_event", lambda task_id: event(task_id, "STARTED"))
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/task_events/t1")
+    await main.task_event_hub.close()
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    states = [line.split(": ")[1] for line in response.text.splitlines() if line.startswith("event:")]
+    assert states == ["started", "progress", "success"]
+
+
+def test_documents_of_a_chunk_report_progress_on_its_channel(published, monkeypatch):
+    class DocumentTask:
+        name = tasks.process_ocr_for_document.name
+
+        def __call__(self, doc_id, parent_id=None):
+            if doc_id == 2:
+                return {"status": "processing", "doc_id": 2, "pages": 3, "assemble_task_id": "assemble-2"}
+            return {"status": "success", "doc_id": doc_id}
+
+    monkeypatch.setattr(tasks, "process_ocr_for_document", DocumentTask())
+    tasks.process_ocr_chunk.apply(args=[[1, 2]], task_id="chunk-1").get()
+
+    assert [(task_id, state, data.get("doc_id"), data.get("doc_state")) for task_id, state, data in published] == [
+        ("chunk-1", "STARTED", None, None),
+        ("chunk-1", "PROGRESS", 1, "STARTED"),
+        ("chunk-1", "PROGRESS", 1, "SUCCESS"),
+        ("chunk-1", "PROGRESS", 2, "STARTED"),
+        ("chunk-1", "SUCCESS", None, None),
+    ]
+    assert published[2][2]["docs_done"] == 1 and published[2][2]["docs"] == 2
+
+
+@pytest.mark.parametrize("in_chunk, expected", [(True, "PROGRESS"), (False, "SUCCESS")])
+def test_assembled_document_reports_to_its_parent(published, in_chunk, expected):
+    result = {"status": "success", "doc_id": 2, "pages": 3}
+    tasks.publish_task_finished(
+        sender=tasks.assemble_ocr_text, task_id="assemble-2", args=(2, 3, "chunk-1", in_chunk),
+        retval=result, state="SUCCESS"
+    )
+    assert published == [("chunk-1", expected, {"doc_id": 2, "doc_state": "SUCCESS", "result": result,
+                                                 "docs": None, "docs_done": None} if in_chunk else {"result": result})]
\ No newline at end of file
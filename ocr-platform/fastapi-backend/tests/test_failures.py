@@ -0,0 +1,125 @@
+import errno
+
+import pytest
+import redis
+from PIL import UnidentifiedImageError
+from celery.exceptions import SoftTimeLimitExceeded
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+
+from app import failures
+from app.failures import is_transient, retry_delay, describe
+
+
+@pytest.mark.parametrize("exc", [
+    OperationalError("SELECT 1", {}, Exception("server closed the connection")),
+    redis.ConnectionError("connection refused"),
+    ConnectionResetError(),
+    TimeoutError(),
+    OSError(errno.ENOSPC, "No space left on device"),
+])
+def test_environment_errors_are_retried(exc):
+    assert is_transient(exc)
+
+
+@pytest.mark.parametrize("exc", [
+    FileNotFoundError(errno.ENOENT, "missing"),
+    UnidentifiedImageError("cannot identify image file"),
+    SoftTimeLimitExceeded(),
+    MemoryError(),
+    OSError(errno.EACCES, "Permission denied"),
+    ValueError("bug"),
+])
+def test_input_and_code_errors_are_permanent(exc):
+    assert not is_transient(exc)
+
+
+def test_retry_delay_grows_and_is_capped(monkeypatch):
+    monkeypatch.setattr(failures, "OCR_RETRY_BACKOFF", 10)
+    monkeypatch.setattr(failures, "OCR_RETRY_BACKOFF_MAX", 60)
+
+    for retries, full in [(0, 10), (1, 20), (2, 40), (3, 60), (10, 60)]:
+        delays = [retry_delay(retries) for _ in range(50)]
+        # Половина задержки фиксирована, половина случайна
+        assert all(full / 2 <= delay <= full for delay in delays)
+
+
+def test_describe_is_bounded():
+    message = describe(ValueError("x" * 1000))
+    assert message.startswith("ValueError: x")
+    assert len(message) == 500
+
+@pytest.fixture
+def chunk_docs(db):
+    # Три документа, захваченные одним пакетным сообщением chunk-1
+    from datetime import date
+    from app.database import SyncSessionLocal
+    from app.models import Document, OCR_QUEUED
+
+    with SyncSessionLocal() as session:
+        docs = [
+            Document(path=f"documents/{i}.png", date=date(2024, 1, 1), ocr_status=OCR_QUEUED, ocr_task_id="chunk-1")
+            for i in range(3)
+        ]
+        session.add_all(docs)
+        session.commit()
+        return [doc.id for doc in docs]
+
+
+@pytest.mark.anyio
+async def test_chunk_timeout_requeues_the_rest_of_the_chunk(chunk_docs, monkeypatch):
+    from app import tasks
+    from app.database import SyncSessionLocal
+    from app.models import Document, OCR_QUEUED
+
+    first, slow, last = chunk_docs
+    requeued = []
+
+    class DocumentTask:
+        name = tasks.process_ocr_for_document.name
+
+        def __call__(self, doc_id, parent_id=None):
+            assert parent_id == "chunk-1"
+            if doc_id == slow:
+                raise SoftTimeLimitExceeded()
+            return {"status": "success", "doc_id": doc_id}
+
+        def apply_async(self, args, task_id, **options):
+            requeued.append((args[0], task_id, options["soft_time_limit"]))
+
+    monkeypatch.setattr(tasks, "process_ocr_for_document", DocumentTask())
+    results = tasks.process_ocr_chunk.apply(args=[chunk_docs], task_id="chunk-1").get()
+
+    assert [(item["doc_id"], item["status"]) for item in results] == [
+        (first, "success"), (slow, "retrying"), (last, "retrying")
+    ]
+    # Каждый оставшийся документ - отдельной задачей со своим лимитом времени
+    assert [doc_id for doc_id, _, _ in requeued] == [slow, last]
+    with SyncSessionLocal() as session:
+        rows = dict(session.execute(select(Document.id, Document.ocr_task_id)).all())
+        statuses = set(session.execute(select(Document.ocr_status).filter(Document.id != first)).scalars())
+    assert rows[first] == "chunk-1"
+    assert {rows[slow], rows[last]} == {task_id for _, task_id, _ in requeued}
+    assert statuses == {OCR_QUEUED}
+
+
+@pytest.mark.anyio
+async def test_chunk_does_not_requeue_a_document_claimed_by_another_task(chunk_docs, monkeypatch):
+    from app import tasks
+    from app.database import SyncSessionLocal
+    from app.models import Document
+
+    first = chunk_docs[0]
+    with SyncSessionLocal() as session:
+        session.execute(update(Document).where(Document.id == first).values(ocr_task_id="task-2"))
+        session.commit()
+
+    def timeout(doc_id, parent_id=None):
+        raise SoftTimeLimitExceeded()
+
+    timeout.name = tasks.process_ocr_for_document.name
+    timeout.apply_async = lambda **kwargs: pytest.fail("requeued a document owned by another task")
+    monkeypatch.setattr(tasks, "process_ocr_for_document", timeout)
+
+    results = tasks.process_ocr_chunk.apply(args=[[first]], task_id="chunk-1").get()
+    assert results == [{"status": "skipped", "doc_id": first, "message": "Chunk time limit exceeded"}]
\ No newline at end of file
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from app.layout import (
+    Layout, WORD_DTYPE, from_tsv, pack, unpack, select, to_text, to_json, pack_result, unpack_result
+)
+
+TSV_HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext"
+
+
+def tsv(*words):
+    lines = [TSV_HEADER, "1\t1\t0\t0\t0\t0\t0\t0\t1000\t800\t-1\t"]
+    for block, par, line, left, top, width, height, conf, text in words:
+        lines.append(f"5\t1\t{block}\t{par}\t{line}\t1\t{left}\t{top}\t{width}\t{height}\t{conf}\t{text}")
+    return "\n".join(lines)
+
+
+SAMPLE = tsv(
+    (1, 1, 1, 10, 20, 50, 15, 96.5, "Счёт"),
+    (1, 1, 1, 70, 20, 40, 15, 91.2, "№42"),
+    (1, 1, 2, 10, 40, 80, 15, 35.0, "итого:"),
+    (2, 1, 1, 500, 600, 60, 20, 88.0, "1 000"),
+)
+
+
+def assert_same(a: Layout, b: Layout):
+    assert (a.width, a.height) == (b.width, b.height)
+    assert a.texts == b.texts
+    assert np.array_equal(a.words, b.words)
+
+
+def test_pack_unpack_round_trip():
+    layout = from_tsv(SAMPLE, (1000, 800), (1000, 800))
+    data = pack(layout)
+
+    assert data.startswith(b"OCL1")
+    restored = unpack(data)
+    assert_same(restored, layout)
+    assert restored.words.dtype == WORD_DTYPE
+    assert restored.texts == ["Счёт", "№42", "итого:", "1 000"]
+    assert restored.words["conf"].tolist() == [96, 91, 35, 88]
+
+
+def test_empty_layout_round_trip():
+    layout = from_tsv(TSV_HEADER, (100, 50), (100, 50))
+    restored = unpack(pack(layout))
+    assert_same(restored, layout)
+    assert (restored.width, restored.height, restored.texts) == (100, 50, [])
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        unpack(b"XXXX" + pack(from_tsv(SAMPLE))[4:])
+
+
+def test_boxes_are_scaled_to_the_original_page():
+    # Tesseract видел страницу, уменьшенную вдвое
+    layout = from_tsv(SAMPLE, (2000, 1600), (1000, 800))
+    assert (layout.width, layout.height) == (2000, 1600)
+    assert layout.words[0][["left", "top", "width", "height"]].tolist() == (20, 40, 100, 30)
+
+
+def test_select_by_bbox_and_confidence():
+    layout = from_tsv(SAMPLE, (1000, 800), (1000, 800))
+
+    assert select(layout, bbox=(0, 0, 200, 100)).texts == ["Счёт", "№42", "итого:"]
+    # Пересечение, а не вложение: рамка задевает край слова
+    assert select(layout, bbox=(555, 615, 900, 900)).texts == ["1 000"]
+    assert select(layout, min_conf=90).texts == ["Счёт", "№42"]
+    assert select(layout, bbox=(0, 0, 200, 100), min_conf=50).texts == ["Счёт", "№42"]
+    assert select(layout, bbox=(900, 0, 1000, 10)).texts == []
+
+
+def test_text_and_json_views():
+    layout = from_tsv(SAMPLE, (1000, 800), (1000, 800))
+
+    assert to_text(layout) == "Счёт №42\nитого:\n1 000"
+    data = to_json(layout)
+    assert data["count"] == 4
+    assert data["words"]["text"] == layout.texts
+    assert data["words"]["left"] == [10, 70, 10, 500]
+
+
+@pytest.mark.parametrize("layout", [None, b"OCL1packed"])
+def test_result_round_trip(layout):
+    text = "Страница 1\n\f"
+    assert unpack_result(pack_result(text, layout)) == (text, layout)
\ No newline at end of file
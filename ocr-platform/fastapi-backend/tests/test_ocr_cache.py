@@ -0,0 +1,59 @@
+from app import ocr, ocr_cache
+from app.ocr_cache import MemoryOCRCache, RedisOCRCache, cache_key
+
+
+def test_key_depends_on_content_language_and_engine():
+    key = cache_key("abc:0", "rus+eng", "pytesseract|5.3.0|")
+    assert key.startswith("ocr:cache:abc:0:")
+    assert cache_key("abc:0", "rus+eng", "pytesseract|5.3.0|") == key
+    assert len({
+        key,
+        cache_key("abc:1", "rus+eng", "pytesseract|5.3.0|"),
+        cache_key("abc:0", "eng", "pytesseract|5.3.0|"),
+        cache_key("abc:0", "rus+eng", "tesserocr|5.3.0|"),
+        cache_key("abc:0", "rus+eng", "pytesseract|4.1.1|"),
+    }) == 5
+
+
+def test_engine_config_names_the_engine_that_loaded(monkeypatch):
+    class Missing:
+        def __init__(self):
+            raise ImportError("tesserocr")
+
+    monkeypatch.setitem(ocr.ENGINES, "missing", Missing)
+    monkeypatch.setattr(ocr, "_engines", {})
+    monkeypatch.setattr(ocr.PytesseractEngine, "version", "5.3.0")
+
+    # Откат на pytesseract даёт его ключи, а не ключи запрошенного движка
+    assert ocr.engine_config("missing") == ocr.engine_config("pytesseract")
+    assert ocr.engine_config("missing").startswith("pytesseract|5.3.0|")
+
+
+def test_memory_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ocr_cache.time, "monotonic", lambda: now[0])
+    cache = MemoryOCRCache(ttl=60)
+
+    cache.set("k", b"v")
+    now[0] += 59
+    assert cache.get("k") == b"v"
+    now[0] += 2
+    assert cache.get("k") is None
+    assert cache.stats() == {"backend": "memory", "hits": 1, "misses": 1, "entries": 0}
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryOCRCache(max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1" and cache.get("c") == b"3"
+
+
+def test_unreachable_redis_is_a_miss_not_an_error():
+    cache = RedisOCRCache("redis://127.0.0.1:1/0")
+    assert cache.get("k") is None
+    cache.set("k", b"v")
+    assert cache.stats() == {"backend": "redis", "available": False}
\ No newline at end of file
@@ -0,0 +1,83 @@
+from datetime import date
+
+import pytest
+from PIL import Image
+from sqlalchemy import select
+
+from app import tasks
+from app.celery_app import celery_app
+from app.database import SyncSessionLocal
+from app.models import Document, DocumentPage, DocumentText, OCR_DONE
+from app.pages import count_pages, load_page, join_pages
+
+pytestmark = pytest.mark.anyio
+
+COLORS = ["red", "green", "blue"]
+
+
+@pytest.fixture
+def tiff(tmp_path):
+    path = str(tmp_path / "scan.tiff")
+    frames = [Image.new("RGB", (20, 10), color) for color in COLORS]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+    return path
+
+
+def test_multi_frame_tiff_is_split_into_pages(tiff):
+    assert count_pages(tiff) == 3
+    for page_no, color in enumerate(COLORS):
+        page = load_page(tiff, page_no)
+        # Файл закрыт, кадр уже в памяти
+        assert page.fp is None
+        assert page.getpixel((0, 0)) == Image.new("RGB", (1, 1), color).getpixel((0, 0))
+
+
+def test_pages_are_separated_not_terminated_by_form_feed():
+    assert join_pages(["one\n\f"]) == "one\n"
+    assert join_pages(["one\n\f", "two\n\f", "three\n"]) == "one\n\ftwo\n\fthree\n"
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    # Текст страницы - цвет её первого пикселя, с \f в конце, как у Tesseract
+    monkeypatch.setattr(tasks, "ocr_page", lambda img: (f"{img.getpixel((0, 0))}\n\f", None))
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+
+
+def add_document(path):
+    with SyncSessionLocal() as session:
+        doc = Document(path=path, date=date(2024, 1, 1), sha256=path[-64:].rjust(64, "0"))
+        session.add(doc)
+        session.commit()
+        return doc.id
+
+
+def stored(doc_id):
+    with SyncSessionLocal() as session:
+        doc = session.get(Document, doc_id)
+        pages = session.execute(
+            select(DocumentPage.text).filter(DocumentPage.id_doc == doc_id).order_by(DocumentPage.page_no)
+        ).scalars().all()
+        text = session.execute(select(DocumentText.text).filter(DocumentText.id_doc == doc_id)).scalar()
+        return doc.ocr_status, pages, text
+
+
+async def test_pages_are_recognized_and_assembled_in_order(db, tiff, fake_ocr):
+    doc_id = add_document(tiff)
+
+    result = tasks.process_ocr_for_document.apply(args=[doc_id], task_id="task-1").get()
+    assert result["status"] == "processing" and result["pages"] == 3
+
+    status, pages, text = stored(doc_id)
+    assert status == OCR_DONE
+    assert pages == ["(255, 0, 0)\n\f", "(0, 128, 0)\n\f", "(0, 0, 255)\n\f"]
+    assert text == "(255, 0, 0)\n\f(0, 128, 0)\n\f(0, 0, 255)\n"
+
+
+async def test_single_page_text_has_no_trailing_form_feed(db, tmp_path, fake_ocr):
+    path = str(tmp_path / "page.png")
+    Image.new("RGB", (20, 10), "red").save(path)
+    doc_id = add_document(path)
+
+    assert tasks.process_ocr_for_document.apply(args=[doc_id], task_id="task-1").get()["status"] == "success"
+    assert stored(doc_id) == (OCR_DONE, ["(255, 0, 0)\n\f"], "(255, 0, 0)\n")
\ No newline at end of file
@@ -0,0 +1,57 @@
+import os
+
+import httpx
+import pytest
+
+from app import main, storage
+from app.storage import adopt_file, resolve_shared_path
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    # Общий том внутри каталога blob - одна файловая система, как в docker-compose
+    root = os.path.join(storage.DOCUMENTS_DIR, "..", "media")
+    os.makedirs(os.path.join(root, "docs"), exist_ok=True)
+    with open(os.path.join(root, "docs", "a.png"), "wb") as f:
+        f.write(b"\x89PNG shared volume")
+    with open(tmp_path / "secret.png", "wb") as f:
+        f.write(b"outside")
+    os.symlink(tmp_path / "secret.png", os.path.join(root, "docs", "escape.png"))
+    monkeypatch.setattr(storage, "SHARED_MEDIA_ROOT", root)
+    yield os.path.realpath(root)
+    for name in ("a.png", "escape.png"):
+        os.remove(os.path.join(root, "docs", name))
+
+
+@pytest.mark.parametrize("key", [
+    "../documents/.tmp", "docs/../../secret.png", "/etc/passwd", "docs/escape.png", "docs/missing.png", "docs",
+])
+def test_keys_outside_the_volume_are_rejected(media, key):
+    with pytest.raises(ValueError):
+        resolve_shared_path(key)
+
+
+def test_key_resolves_inside_the_volume(media):
+    assert resolve_shared_path("docs/./a.png") == os.path.join(media, "docs", "a.png")
+
+
+def test_shared_file_is_adopted_as_a_hard_link(media):
+    source = resolve_shared_path("docs/a.png")
+    blob = adopt_file(source)
+    assert blob.created and blob.path != source
+    assert os.path.samefile(blob.path, source)
+    assert adopt_file(source) == blob._replace(created=False)
+    os.remove(blob.path)
+
+
+async def test_register_rejects_traversal(db, media):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        rejected = await client.post("/register_doc", json={"storage_key": "../../etc/passwd", "doc_date": "2024-01-01"})
+        registered = await client.post("/register_doc", json={"storage_key": "docs/a.png", "doc_date": "2024-01-01"})
+
+    assert rejected.status_code == 400
+    assert registered.status_code == 201
+    assert storage.is_managed(registered.json()["path"])
\ No newline at end of file
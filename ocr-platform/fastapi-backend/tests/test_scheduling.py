@@ -0,0 +1,131 @@
+import os
+from types import SimpleNamespace
+
+import celery
+import pytest
+import redis
+from PIL import Image
+
+from app import scheduling
+from app.main import plan_batch, publish_batch
+from app.scheduling import (
+    LANE_SMALL, LANE_MEDIUM, LANE_LARGE, OCR_FAIR_SHARE, claim_priorities, estimate_cost, lane_for,
+    queue_for_priority, time_limits
+)
+
+
+class Counters:
+    """Счётчики Redis для claim_priorities: INCRBY и EXPIRE через pipeline."""
+
+    def __init__(self):
+        self.values = {}
+
+    def pipeline(self):
+        return self
+
+    def incrby(self, key, amount):
+        self.values[key] = self.values.get(key, 0) + amount
+        self.result = self.values[key]
+
+    def expire(self, key, seconds, nx=False):
+        pass
+
+    def execute(self):
+        return [self.result, True]
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    fake = Counters()
+    monkeypatch.setattr(scheduling, "get_client", lambda: fake)
+    return fake
+
+
+def test_cost_counts_megapixels_of_every_page(tmp_path):
+    path = str(tmp_path / "scan.tiff")
+    frames = [Image.new("L", (1000, 2000)) for _ in range(3)]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+
+    estimate = estimate_cost(path)
+    assert estimate.pages == 3
+    # 2 Мп на страницу плюс поправка на размер файла
+    assert estimate.cost == round(3 * 2.0 + os.path.getsize(path) / 1e6 * scheduling.OCR_COST_PER_MB, 3)
+
+
+def test_unreadable_file_is_estimated_as_one_cheap_page(tmp_path):
+    path = tmp_path / "broken.png"
+    path.write_bytes(b"not an image")
+    assert estimate_cost(str(path)).pages == 1
+    assert lane_for(estimate_cost(str(path)).cost) == LANE_SMALL
+
+
+@pytest.mark.parametrize("cost, lane", [
+    (None, LANE_SMALL), (0, LANE_SMALL), (16, LANE_SMALL), (16.1, LANE_MEDIUM), (160, LANE_MEDIUM), (1000, LANE_LARGE),
+])
+def test_lane_by_cost(cost, lane):
+    assert lane_for(cost) == lane
+
+
+def test_time_limits_grow_with_cost_and_are_capped():
+    assert time_limits(None) == {"soft_time_limit": 30, "time_limit": 60}
+    assert time_limits(100) == {"soft_time_limit": 230, "time_limit": 260}
+    assert time_limits(10 ** 6) == {"soft_time_limit": 1800, "time_limit": 1830}
+
+
+def test_priority_drops_with_the_owners_recent_volume(counters):
+    first = claim_priorities("alice", OCR_FAIR_SHARE * 2 + 1)
+    assert first[:OCR_FAIR_SHARE] == [0] * OCR_FAIR_SHARE
+    assert first[OCR_FAIR_SHARE:] == [1] * OCR_FAIR_SHARE + [2]
+
+    # Единичная задача другого владельца не ждёт за пакетом
+    assert claim_priorities("bob") == [0]
+    assert claim_priorities("alice") == [2]
+    assert claim_priorities("alice", OCR_FAIR_SHARE * 20)[-1] == scheduling.MAX_PRIORITY
+
+
+def test_priority_falls_back_to_highest_without_redis(monkeypatch):
+    def unavailable():
+        raise redis.ConnectionError("down")
+
+    monkeypatch.setattr(scheduling, "get_client", unavailable)
+    assert claim_priorities("alice", 3) == [0, 0, 0]
+
+
+def test_priority_is_a_separate_redis_queue():
+    assert queue_for_priority(LANE_SMALL, 0) == LANE_SMALL
+    assert queue_for_priority(LANE_SMALL, 3) == f"{LANE_SMALL}\x06\x163"
+
+
+def test_batch_is_split_by_lane_and_chunk():
+    docs = [SimpleNamespace(id=i, cost=cost, path=None) for i, cost in enumerate([1, 2, 100, 3, 500])]
+    plan = plan_batch(docs, chunk_size=2)
+
+    assert [(lane, doc_ids, cost) for lane, _, doc_ids, cost in plan] == [
+        (LANE_SMALL, [0, 1], 3), (LANE_SMALL, [3], 3), (LANE_MEDIUM, [2], 100), (LANE_LARGE, [4], 500),
+    ]
+    assert len({task_id for _, task_id, _, _ in plan}) == len(plan)
+
+
+def test_published_messages_carry_lane_priority_and_limits(counters, monkeypatch):
+    published = []
+
+    class Group:
+        def __init__(self, tasks):
+            published.extend(tasks)
+
+        def apply_async(self):
+            return SimpleNamespace(save=lambda: None)
+
+    monkeypatch.setattr(celery, "group", Group)
+    monkeypatch.setattr(scheduling, "OCR_FAIR_SHARE", 2)
+    counters.values[f"{scheduling.FAIR_PREFIX}alice"] = 1
+
+    plan = [(LANE_SMALL, "chunk-1", [1, 2], 3.0), (LANE_LARGE, "task-3", [3], 500.0)]
+    publish_batch(plan, "alice")
+
+    chunk, single = published
+    assert (chunk.task, chunk.args) == ("process_ocr_chunk_task", ([1, 2],))
+    assert (single.task, single.args) == ("process_ocr_task", (3,))
+    # Приоритет сообщения - по номеру его первого документа у владельца: 1 и 3 при доле 2
+    assert chunk.options == {"queue": LANE_SMALL, "priority": 0, "task_id": "chunk-1", **time_limits(3.0)}
+    assert single.options == {"queue": LANE_LARGE, "priority": 1, "task_id": "task-3", **time_limits(500.0)}
\ No newline at end of file
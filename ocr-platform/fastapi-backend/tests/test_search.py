@@ -0,0 +1,12 @@
+from app.search import HIGHLIGHT_START, HIGHLIGHT_STOP, render_snippet
+
+
+def test_snippet_text_is_escaped_and_matches_are_highlighted():
+    snippet = f'5 < 7 {HIGHLIGHT_START}счёт{HIGHLIGHT_STOP} "a" & <img src=x onerror=alert(1)>'
+    assert render_snippet(snippet) == (
+        "5 &lt; 7 <b>счёт</b> &quot;a&quot; &amp; &lt;img src=x onerror=alert(1)&gt;"
+    )
+
+
+def test_markup_in_the_document_is_not_a_highlight():
+    assert render_snippet("<b>счёт</b>") == "&lt;b&gt;счёт&lt;/b&gt;"
\ No newline at end of file
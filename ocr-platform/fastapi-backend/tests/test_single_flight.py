@@ -0,0 +1,158 @@
+import asyncio
+from datetime import datetime, date, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app import main
+from app.database import AsyncSessionLocal
+from app.main import (
+    claim_documents, release_documents, in_flight_tasks, enqueue_ocr, OCR_INFLIGHT_TIMEOUT, OCR_QUEUED_TIMEOUT
+)
+from app.models import Document, OCR_QUEUED, OCR_PROCESSING, OCR_DONE, OCR_FAILED
+
+pytestmark = pytest.mark.anyio
+
+
+async def add_documents(db, count: int) -> list:
+    docs = [Document(path=f"documents/{i}.png", date=date(2024, 1, 1), sha256=f"{i:064x}") for i in range(count)]
+    db.add_all(docs)
+    await db.commit()
+    return [doc.id for doc in docs]
+
+
+async def states() -> dict:
+    # Отдельная сессия: объекты тестовой сессии не перечитываются
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(Document.id, Document.ocr_status, Document.ocr_task_id))
+        return {row.id: (row.ocr_status, row.ocr_task_id) for row in result.all()}
+
+
+async def test_claim_sets_each_document_its_own_task(db):
+    first, second = await add_documents(db, 2)
+
+    assert await claim_documents(db, {first: "task-1", second: "task-2"}) == {first, second}
+    assert await states() == {first: (OCR_QUEUED, "task-1"), second: (OCR_QUEUED, "task-2")}
+
+
+async def test_document_in_flight_is_not_claimed_again(db):
+    doc_id, = await add_documents(db, 1)
+    await claim_documents(db, {doc_id: "task-1"})
+
+    for status in (OCR_QUEUED, OCR_PROCESSING):
+        await db.execute(update(Document).values(ocr_status=status))
+        await db.commit()
+        assert await claim_documents(db, {doc_id: "task-2"}) == set()
+    assert await in_flight_tasks(db, [doc_id]) == {doc_id: "task-1"}
+
+
+@pytest.mark.parametrize("status", [OCR_DONE, OCR_FAILED])
+async def test_finished_document_can_be_claimed_again(db, status):
+    doc_id, = await add_documents(db, 1)
+    await claim_documents(db, {doc_id: "task-1"})
+    await db.execute(update(Document).values(ocr_status=status))
+    await db.commit()
+
+    assert await claim_documents(db, {doc_id: "task-2"}) == {doc_id}
+    assert (await states())[doc_id] == (OCR_QUEUED, "task-2")
+
+
+async def test_stale_claim_is_taken_over(db):
+    doc_id, = await add_documents(db, 1)
+    await claim_documents(db, {doc_id: "lost"})
+    stale = datetime.utcnow() - timedelta(seconds=OCR_INFLIGHT_TIMEOUT + 60)
+    await db.execute(update(Document).values(ocr_status=OCR_PROCESSING, ocr_updated_at=stale))
+    await db.commit()
+
+    assert await claim_documents(db, {doc_id: "task-2"}) == {doc_id}
+
+
+async def test_queue_wait_is_not_mistaken_for_a_lost_task(db):
+    doc_id, = await add_documents(db, 1)
+    await claim_documents(db, {doc_id: "task-1"})
+
+    # Долгое ожидание в очереди - не потеря задачи, пока не вышел таймаут очереди
+    waiting = datetime.utcnow() - timedelta(seconds=OCR_INFLIGHT_TIMEOUT + 60)
+    await db.execute(update(Document).values(ocr_updated_at=waiting))
+    await db.commit()
+    assert await claim_documents(db, {doc_id: "task-2"}) == set()
+
+    lost = datetime.utcnow() - timedelta(seconds=OCR_QUEUED_TIMEOUT + 60)
+    await db.execute(update(Document).values(ocr_updated_at=lost))
+    await db.commit()
+    assert await claim_documents(db, {doc_id: "task-2"}) == {doc_id}
+
+
+async def test_worker_skips_a_message_for_a_reclaimed_document(db):
+    from app.tasks import process_ocr_for_document
+
+    doc_id, = await add_documents(db, 1)
+    await claim_documents(db, {doc_id: "task-2"})
+
+    result = process_ocr_for_document.apply(args=[doc_id], task_id="task-1").get()
+    assert result["status"] == "skipped"
+    assert (await states())[doc_id] == (OCR_QUEUED, "task-2")
+
+
+async def test_worker_starts_the_document_it_was_given(db):
+    from app.database import SyncSessionLocal
+    from app.tasks import start_document
+
+    doc_id, = await add_documents(db, 1)
+    await claim_documents(db, {doc_id: "task-1"})
+
+    with SyncSessionLocal() as session:
+        assert not start_document(session, doc_id, "task-0")
+        assert start_document(session, doc_id, "task-1")
+    assert (await states())[doc_id] == (OCR_PROCESSING, "task-1")
+
+
+async def test_concurrent_claims_have_one_winner(db):
+    doc_id, = await add_documents(db, 1)
+
+    async def claim(n: int) -> set:
+        async with AsyncSessionLocal() as session:
+            return await claim_documents(session, {doc_id: f"task-{n}"})
+
+    results = await asyncio.gather(*(claim(n) for n in range(10)))
+    winners = [n for n, claimed in enumerate(results) if claimed]
+    assert len(winners) == 1
+    assert (await states())[doc_id] == (OCR_QUEUED, f"task-{winners[0]}")
+
+
+async def test_release_frees_only_unstarted_documents(db):
+    queued, started = await add_documents(db, 2)
+    await claim_documents(db, {queued: "task-1", started: "task-2"})
+    await db.execute(update(Document).where(Document.id == started).values(ocr_status=OCR_PROCESSING))
+    await db.commit()
+
+    await release_documents(db, ["task-1", "task-2"])
+    assert await states() == {queued: (None, "task-1"), started: (OCR_PROCESSING, "task-2")}
+
+
+async def test_enqueue_returns_the_running_task(db, monkeypatch):
+    doc_id, = await add_documents(db, 1)
+    doc = await db.get(Document, doc_id)
+    sent = []
+    monkeypatch.setattr(main, "send_ocr_task", lambda doc, task_id, owner=None: sent.append(task_id))
+
+    task_id, queued = await enqueue_ocr(db, doc, "user-1")
+    assert queued and sent == [task_id]
+    assert await enqueue_ocr(db, doc, "user-2") == (task_id, False)
+    assert sent == [task_id]
+
+
+async def test_enqueue_releases_the_claim_when_publishing_fails(db, monkeypatch):
+    doc_id, = await add_documents(db, 1)
+    doc = await db.get(Document, doc_id)
+
+    def broker_down(*args, **kwargs):
+        raise ConnectionError("broker unavailable")
+
+    monkeypatch.setattr(main, "send_ocr_task", broker_down)
+    with pytest.raises(ConnectionError):
+        await enqueue_ocr(db, doc)
+    assert (await states())[doc_id][0] is None
+
+    monkeypatch.setattr(main, "send_ocr_task", lambda *args, **kwargs: None)
+    assert (await enqueue_ocr(db, doc))[1]
\ No newline at end of file
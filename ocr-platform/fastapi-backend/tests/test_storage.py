@@ -0,0 +1,85 @@
+import os
+
+import httpx
+import pytest
+
+from app import main
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_same_content_is_stored_once(db):
+    data = b"\x89PNG same bytes"
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = (await client.post("/upload_raw?filename=a.png&doc_date=2024-01-01", content=data)).json()
+        again = (await client.post("/upload_raw?filename=b.png&doc_date=2024-01-01", content=data)).json()
+        # Те же байты с другим расширением - та же запись и без второго blob
+        renamed = (await client.post("/upload_raw?filename=a.jpg&doc_date=2024-01-01", content=data)).json()
+
+    assert not first["duplicate"] and again["duplicate"] and renamed["duplicate"]
+    assert first["document_id"] == again["document_id"] == renamed["document_id"]
+    assert os.path.exists(first["path"])
+    blob_dir = os.path.dirname(first["path"])
+    assert os.listdir(blob_dir) == [os.path.basename(first["path"])]
+
+async def upload(client, data: bytes, filename: str) -> dict:
+    response = await client.post(f"/upload_raw?filename={filename}&doc_date=2024-01-01", content=data)
+    return response.json()
+
+
+async def test_delete_keeps_content_uploaded_again(db):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await upload(client, b"\x89PNG shared", "a.png")
+        await upload(client, b"\x89PNG shared", "b.png")
+
+        # Вторая загрузка ещё ссылается на запись: blob остаётся
+        removed = (await client.delete(f"/doc_delete/{first['document_id']}")).json()
+        assert removed["references"] == 1 and not removed["file_deleted"]
+        assert os.path.exists(first["path"])
+
+        removed = (await client.delete(f"/doc_delete/{first['document_id']}")).json()
+        assert removed["references"] == 0 and removed["file_deleted"]
+        assert not os.path.exists(first["path"])
+        assert (await client.delete(f"/doc_delete/{first['document_id']}")).status_code == 404
+
+
+async def test_backfill_merges_documents_with_the_same_content(db):
+    from datetime import date
+    from sqlalchemy import select
+    from app.database import SyncSessionLocal, sync_engine
+    from app.migrate import migrate
+    from app.models import Document, DocumentText
+    from app.storage import DOCUMENTS_DIR
+
+    paths = []
+    for name, data in [("old-1.png", b"same"), ("old-2.png", b"same"), ("old-3.png", b"other")]:
+        path = os.path.join(DOCUMENTS_DIR, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+
+    with SyncSessionLocal() as session:
+        docs = [Document(path=path, date=date(2024, 1, 1)) for path in paths]
+        session.add_all(docs)
+        session.flush()
+        # Распознан только дубликат: текст переходит к сохраняемой записи
+        session.add(DocumentText(id_doc=docs[1].id, text="recognized"))
+        session.commit()
+        keeper, duplicate, other = [doc.id for doc in docs]
+
+    migrate(sync_engine)
+
+    with SyncSessionLocal() as session:
+        rows = {doc.id: doc for doc in session.execute(select(Document)).scalars()}
+        assert set(rows) == {keeper, other}
+        assert rows[keeper].ref_count == 2 and rows[other].ref_count == 1
+        assert rows[keeper].sha256 and rows[keeper].sha256 != rows[other].sha256
+        assert rows[keeper].text.text == "recognized"
+    assert os.path.exists(paths[0]) and not os.path.exists(paths[1])
+
+    # Повторный запуск ничего не меняет
+    migrate(sync_engine)
+    with SyncSessionLocal() as session:
+        assert session.execute(select(Document.id)).scalars().all() == [keeper, other]
\ No newline at end of file
@@ -0,0 +1,82 @@
+import gzip
+import json
+from datetime import date
+
+import httpx
+import pytest
+
+from app import main
+from app.models import Document, DocumentText, OCR_FAILED
+from app.texts import TEXT_GZIP_MIN_SIZE, etag_matches, gzip_chunks, iter_text_json, text_etag, weak_etag
+
+pytestmark = pytest.mark.anyio
+
+LONG_TEXT = "Счёт №42 \"итого\"\n" * (TEXT_GZIP_MIN_SIZE // 8)
+
+
+def test_etag_is_weak_and_compared_weakly():
+    etag = text_etag("text")
+    assert etag.startswith('W/"')
+    assert etag_matches(etag, etag)
+    assert etag_matches(etag.removeprefix("W/"), etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert weak_etag(etag.removeprefix("W/")) == weak_etag(etag) == etag
+
+
+def test_streamed_json_is_valid_across_chunks(monkeypatch):
+    monkeypatch.setattr("app.texts.TEXT_CHUNK_SIZE", 7)
+    body = b"".join(gzip_chunks(iter_text_json({"doc_id": 1}, LONG_TEXT)))
+    assert json.loads(gzip.decompress(body)) == {"doc_id": 1, "text": LONG_TEXT}
+
+
+async def add_document(db, text):
+    doc = Document(path="documents/a.png", date=date(2024, 1, 1), sha256="0" * 64, ocr_status=OCR_FAILED)
+    db.add(doc)
+    await db.flush()
+    if text is not None:
+        db.add(DocumentText(id_doc=doc.id, text=text))
+    await db.commit()
+    return doc.id
+
+
+async def get_text(doc_id, **headers):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(f"/get_text/{doc_id}", headers=headers)
+
+
+async def test_gzip_and_identity_share_a_weak_etag(db):
+    doc_id = await add_document(db, LONG_TEXT)
+
+    compressed = await get_text(doc_id, **{"Accept-Encoding": "gzip"})
+    identity = await get_text(doc_id, **{"Accept-Encoding": "identity"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in identity.headers
+    assert compressed.json() == identity.json() == {
+        "doc_id": doc_id, "path": "documents/a.png", "date": "2024-01-01", "text": LONG_TEXT
+    }
+    assert compressed.headers["etag"] == identity.headers["etag"] == text_etag(LONG_TEXT)
+    assert compressed.headers["vary"] == "Accept-Encoding"
+
+
+async def test_matching_etag_is_not_modified(db):
+    doc_id = await add_document(db, "short")
+    etag = (await get_text(doc_id)).headers["etag"]
+
+    response = await get_text(doc_id, **{"If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert response.status_code == 304 and not response.content
+    assert response.headers["etag"] == etag and response.headers["vary"] == "Accept-Encoding"
+
+    # Короткий текст не сжимается
+    assert "content-encoding" not in (await get_text(doc_id, **{"Accept-Encoding": "gzip"})).headers
+
+
+async def test_missing_text_reports_the_ocr_state(db):
+    doc_id = await add_document(db, None)
+    response = await get_text(doc_id)
+    assert response.status_code == 404
+    assert response.json()["ocr_status"] == OCR_FAILED
+    assert (await get_text(doc_id + 1)).status_code == 404
\ No newline at end of file